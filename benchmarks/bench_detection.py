@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Scaling of the detection functions."""
+
+import geoplanar
+
+from .synthetic import tessellation
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+class Detection:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.gdf = tessellation(n)
+
+    def time_gaps(self, n):
+        geoplanar.gaps(self.gdf)
+
+    def peakmem_gaps(self, n):
+        geoplanar.gaps(self.gdf)
+
+    def time_non_planar_edges(self, n):
+        geoplanar.non_planar_edges(self.gdf)
+
+    def peakmem_non_planar_edges(self, n):
+        geoplanar.non_planar_edges(self.gdf)
+
+    def time_check_validity(self, n):
+        geoplanar.check_validity(self.gdf)
+
+    def peakmem_check_validity(self, n):
+        geoplanar.check_validity(self.gdf)
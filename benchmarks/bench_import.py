@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""Import time of geoplanar, each run in a fresh interpreter."""
+
+
+class Import:
+    def timeraw_import_geoplanar(self):
+        return "import geoplanar"
+
+    def timeraw_import_gaps(self):
+        return "from geoplanar import gaps"
+
+    def timeraw_import_is_overlapping(self):
+        return "from geoplanar import is_overlapping"
+
+    def timeraw_import_all(self):
+        return "from geoplanar import *"
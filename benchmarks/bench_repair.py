@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Scaling of the repair functions."""
+
+import geoplanar
+
+from .synthetic import tessellation
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+class FillGaps:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.gdf = tessellation(n, overlaps=0, nonplanar=0, enclaves=0)
+
+    def time_fill_gaps(self, n):
+        geoplanar.fill_gaps(self.gdf)
+
+    def peakmem_fill_gaps(self, n):
+        geoplanar.fill_gaps(self.gdf)
+
+
+class TrimOverlaps:
+    params = (SIZES, ["largest", "smallest", "compact"])
+    param_names = ["n", "strategy"]
+
+    def setup(self, n, strategy):
+        self.gdf = tessellation(n, gaps=0, nonplanar=0, enclaves=0)
+
+    def time_trim_overlaps(self, n, strategy):
+        geoplanar.trim_overlaps(self.gdf, strategy=strategy)
+
+    def peakmem_trim_overlaps(self, n, strategy):
+        geoplanar.trim_overlaps(self.gdf, strategy=strategy)
+
+
+class Snap:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.gdf = tessellation(n, overlaps=0, nonplanar=0, enclaves=0)
+
+    def time_snap(self, n):
+        geoplanar.snap(self.gdf, threshold=0.1)
+
+    def peakmem_snap(self, n):
+        geoplanar.snap(self.gdf, threshold=0.1)
+
+
+class AddInteriors:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.gdf = tessellation(n, gaps=0, overlaps=0, nonplanar=0)
+
+    def time_add_interiors(self, n):
+        geoplanar.add_interiors(self.gdf)
+
+    def peakmem_add_interiors(self, n):
+        geoplanar.add_interiors(self.gdf)
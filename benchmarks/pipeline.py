@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""End-to-end timing of the workflow used to combine national layers.
+
+The pipeline replays the steps of the ``usmex`` and ``USCAN`` notebooks: snap
+the polygons along the border between the regions, fill the gaps, trim the
+overlaps and check the contiguity of the result. Snapping runs first, as its
+moved vertices open new gaps and overlaps that the following steps repair. It
+runs on a polygon file with a column naming the region of each polygon, or on a
+synthetic stand-in built by :func:`synthetic.border`, and reports the wall time
+and peak resident memory of each stage with the counts of violations before and
+after, as JSON::
+
+    python -m benchmarks.pipeline --size 100000 --output pipeline.json
+
+The command fails after writing the report if the pipeline did not reduce the
+number of violations.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import geopandas
+import numpy as np
+import shapely
+from libpysal.graph import Graph
+
+import geoplanar
+
+from .synthetic import border
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+__all__ = ["run_pipeline"]
+
+
+def _peak_rss():
+    """Peak resident memory of the process so far, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _violations(gdf):
+    """Count the planar enforcement violations of a layer."""
+    context = geoplanar.PlanarContext(gdf)
+    overlaps = geoplanar.overlaps(gdf, context=context)
+    edges = geoplanar.non_planar_edges(gdf, context=context)
+    interiors = geoplanar.missing_interiors(gdf, context=context)
+    return {
+        "invalid": int((~shapely.is_valid(context.geometry)).sum()),
+        "gaps": len(geoplanar.gaps(gdf, context=context)),
+        "overlaps": overlaps.shape[1] // 2,
+        "nonplanaredges": edges.n_edges // 2,
+        "missinginteriors": interiors.shape[1],
+    }
+
+
+def _contiguity(gdf):
+    """Summarize the rook contiguity of a layer."""
+    geoms = gdf.geometry.values
+    # contiguity is only defined for polygons, drop the lines and points left
+    # in collections by the repairs
+    collections = gdf.geom_type.to_numpy() == "GeometryCollection"
+    if collections.any():
+        geoms = geoms.copy()
+        geoms[collections] = shapely.buffer(geoms[collections], 0)
+    graph = Graph.build_contiguity(
+        geopandas.GeoSeries(geoms, index=gdf.index), rook=True
+    )
+    return {
+        "components": int(graph.n_components),
+        "isolates": len(graph.isolates),
+        "joins": int(graph.n_edges) // 2,
+    }
+
+
+def _border(gdf, region, threshold):
+    """Positions of the polygons within ``threshold`` of another region."""
+    i, j = gdf.sindex.query(gdf.geometry, predicate="dwithin", distance=threshold)
+    regions = gdf[region].to_numpy()
+    return np.unique(i[regions[i] != regions[j]])
+
+
+def _snap_border(gdf, region, threshold):
+    positions = _border(gdf, region, threshold)
+    snapped = geoplanar.snap(gdf.iloc[positions], threshold=threshold)
+    gdf = gdf.copy()
+    gdf.iloc[positions, gdf.columns.get_loc(gdf.geometry.name)] = snapped.values
+    return gdf
+
+
+def run_pipeline(gdf, region="region", threshold=0.1):
+    """Run the repair pipeline on a layer and time each stage.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        polygon layer
+    region : str, default "region"
+        column naming the region of each polygon, whose borders are snapped
+    threshold : float, default 0.1
+        snapping threshold, in the units of the layer
+
+    Returns
+    -------
+    dict
+        ``"stages"``, the wall time in seconds and the peak resident memory of
+        the process in MB after each stage, ``"violations"`` and
+        ``"contiguity"`` before and after the pipeline
+    """
+    report = {
+        "violations": {"before": _violations(gdf)},
+        "contiguity": {"before": _contiguity(gdf)},
+        "stages": [],
+    }
+    stages = [
+        ("snap_border", lambda gdf: _snap_border(gdf, region, threshold)),
+        ("fill_gaps", geoplanar.fill_gaps),
+        ("trim_overlaps", geoplanar.trim_overlaps),
+    ]
+    for name, func in stages:
+        start = time.perf_counter()
+        gdf = func(gdf)
+        report["stages"].append(
+            {
+                "stage": name,
+                "seconds": time.perf_counter() - start,
+                "peak_rss_mb": _peak_rss(),
+            }
+        )
+
+    start = time.perf_counter()
+    report["contiguity"]["after"] = _contiguity(gdf)
+    report["stages"].append(
+        {
+            "stage": "contiguity",
+            "seconds": time.perf_counter() - start,
+            "peak_rss_mb": _peak_rss(),
+        }
+    )
+    report["violations"]["after"] = _violations(gdf)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--input", help="polygon file; a synthetic border layer if not given"
+    )
+    parser.add_argument(
+        "--region", default="region", help="column naming the region of each polygon"
+    )
+    parser.add_argument(
+        "--size", type=int, default=100_000, help="size of the synthetic layer"
+    )
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--output", help="JSON file; printed if not given")
+    args = parser.parse_args(argv)
+
+    if args.input is None:
+        gdf = border(args.size)
+        source = f"synthetic border, {args.size} cells"
+    elif args.input.endswith(".parquet"):
+        gdf = geopandas.read_parquet(args.input)
+        source = args.input
+    else:
+        gdf = geopandas.read_file(args.input)
+        source = args.input
+
+    report = {
+        "input": source,
+        "polygons": len(gdf),
+        "threshold": args.threshold,
+        "versions": {
+            "python": platform.python_version(),
+            "geoplanar": getattr(geoplanar, "__version__", None),
+            "geopandas": geopandas.__version__,
+            "shapely": shapely.__version__,
+            "geos": shapely.geos_version_string,
+        },
+        "machine": platform.platform(),
+        **run_pipeline(gdf, region=args.region, threshold=args.threshold),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    before, after = (
+        sum(report["violations"][when].values()) for when in ("before", "after")
+    )
+    if after and after >= before:
+        sys.exit(
+            f"The pipeline did not reduce the violations: {before} before, "
+            f"{after} after."
+        )
+
+
+if __name__ == "__main__":
+    main()
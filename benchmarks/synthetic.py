@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic polygon layers with injected planar violations."""
+
+import geopandas
+import numpy as np
+import shapely
+
+__all__ = ["border", "tessellation"]
+
+
+def _lattice(side, jitter, rng):
+    """Vertices of a square lattice of unit spacing, jittered inside."""
+    vertices = np.stack(
+        np.meshgrid(np.arange(side + 1.0), np.arange(side + 1.0)), axis=-1
+    )
+    vertices[1:-1, 1:-1] += rng.uniform(-jitter, jitter, (side - 1, side - 1, 2))
+    return vertices
+
+
+def _corners(vertices):
+    """Corners of the cells of a lattice, counter-clockwise from the lower left."""
+    return np.stack(
+        [
+            vertices[:-1, :-1],
+            vertices[:-1, 1:],
+            vertices[1:, 1:],
+            vertices[1:, :-1],
+        ],
+        axis=2,
+    ).reshape(-1, 4, 2)
+
+
+def _polygons(corners):
+    return shapely.polygons(np.concatenate([corners, corners[:, :1]], axis=1))
+
+
+def tessellation(
+    n, gaps=0.01, overlaps=0.01, nonplanar=0.01, enclaves=0.005, jitter=0.3, seed=0
+):
+    """Build a perturbed grid tessellation with injected planar violations.
+
+    The layer starts as a planar coverage of quadrilaterals on a jittered square
+    lattice of unit spacing, so that neighboring cells share their vertices. A
+    share of the cells is then modified, each by a single violation:
+
+    - gap: the cell is shrunk towards its center, leaving a gap around it
+    - overlap: the cell is enlarged around its center, overlapping its neighbors
+    - non-planar edge: the cell is split in three strips, the middle strip
+      sharing edges with its left and right neighbors without sharing a vertex
+    - enclave: a small cell is added inside the cell, without an interior ring
+
+    The modified cells are drawn among cells that are not adjacent to each other,
+    so that the modifications do not interact. The shares count modified cells,
+    not detected violations: an enlarged cell overlaps all eight of its neighbors
+    and crosses their edges without sharing a vertex, and :func:`geoplanar.gaps`
+    also reports the faces of the overlaps.
+
+    Parameters
+    ----------
+    n : int
+        approximate number of cells of the lattice
+    gaps, overlaps, nonplanar, enclaves : float
+        share of the cells modified by each violation
+    jitter : float, default 0.3
+        maximum displacement of the lattice vertices, as a share of the spacing
+    seed : int, default 0
+        seed of the random generator
+
+    Returns
+    -------
+    GeoDataFrame
+        polygons, followed by the additional strips and enclaves
+    """
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n)))
+    vertices = _lattice(side, jitter, rng)
+
+    # modified cells are at least two cells apart
+    rows, cols = np.divmod(np.arange(side * side), side)
+    candidates = np.flatnonzero((rows % 3 == 1) & (cols % 3 == 1))
+    candidates = rng.permutation(candidates)
+    counts = np.round(np.array([gaps, overlaps, nonplanar, enclaves]) * side**2)
+    if counts.sum() > len(candidates):
+        raise ValueError("Too many violations for the size of the layer.")
+    bounds = np.r_[0, np.cumsum(counts.astype(int))]
+    gap, overlap, split, enclave = (
+        candidates[bounds[k] : bounds[k + 1]] for k in range(4)
+    )
+
+    # the side edges of split cells are vertical, so that the points dividing
+    # them lie exactly on the edges of the neighbors
+    i, j = rows[split], cols[split]
+    for di in [0, 1]:
+        for dj in [0, 1]:
+            vertices[i + di, j + dj, 0] = j + dj
+
+    corners = _corners(vertices)
+    centers = corners.mean(axis=1, keepdims=True)
+    corners[gap] = centers[gap] + (corners[gap] - centers[gap]) * 0.9
+    corners[overlap] = centers[overlap] + (corners[overlap] - centers[overlap]) * 1.1
+    inner = centers[enclave] + (corners[enclave] - centers[enclave]) * 0.2
+
+    # points at a third and two thirds of the left and right edges
+    lower, upper = corners[split, :2], corners[split, :1:-1]
+    first = lower + (upper - lower) / 3
+    second = lower + (upper - lower) * 2 / 3
+    strips = [
+        np.concatenate([lower, first[:, ::-1]], axis=1),
+        np.concatenate([first, second[:, ::-1]], axis=1),
+        np.concatenate([second, upper[:, ::-1]], axis=1),
+    ]
+    corners[split] = strips[0]
+
+    corners = np.concatenate([corners, strips[1], strips[2], inner])
+    return geopandas.GeoDataFrame(geometry=_polygons(corners))
+
+
+def border(n, offset=0.05, jitter=0.3, seed=0):
+    """Build two adjacent regions digitized independently along their border.
+
+    The layer is a jittered grid tessellation split in two regions by the middle
+    column of vertices, whose vertices are displaced independently on each side,
+    as when two national layers are combined. The mismatch leaves gaps and
+    overlaps along the border while each region is planar on its own.
+
+    Parameters
+    ----------
+    n : int
+        approximate number of cells
+    offset : float, default 0.05
+        maximum displacement of the border vertices on each side
+    jitter : float, default 0.3
+        maximum displacement of the lattice vertices, as a share of the spacing
+    seed : int, default 0
+        seed of the random generator
+
+    Returns
+    -------
+    GeoDataFrame
+        polygons with the ``"region"`` they belong to, ``"A"`` or ``"B"``
+    """
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n)))
+    middle = side // 2
+    vertices = _lattice(side, jitter, rng)
+    left, right = vertices.copy(), vertices.copy()
+    left[:, middle, 0] += rng.uniform(-offset, offset, side + 1)
+    right[:, middle, 0] += rng.uniform(-offset, offset, side + 1)
+
+    east = np.tile(np.arange(side) >= middle, side)
+    corners = np.where(east[:, None, None], _corners(right), _corners(left))
+    return geopandas.GeoDataFrame(
+        {"region": np.where(east, "B", "A")}, geometry=_polygons(corners)
+    )
@@ -5,13 +5,58 @@ A module for handling planar enforcement for polygon geoseries.
 """
 
 import contextlib
+import importlib
 from importlib.metadata import PackageNotFoundError, version
 
-from geoplanar.gap import *
-from geoplanar.hole import *
-from geoplanar.overlap import *
-from geoplanar.planar import *
-from geoplanar.valid import *
+# public names and the submodule defining them; submodules are only imported on
+# first access, so that importing geoplanar stays cheap
+_EXPORTS = {
+    "PlanarContext": "context",
+    "gaps": "gap",
+    "fill_gaps": "gap",
+    "snap": "gap",
+    "add_interiors": "hole",
+    "missing_interiors": "hole",
+    "Instrumentation": "instrumentation",
+    "instrument": "instrumentation",
+    "overlaps": "overlap",
+    "trim_overlaps": "overlap",
+    "is_overlapping": "overlap",
+    "merge_overlaps": "overlap",
+    "merge_touching": "overlap",
+    "non_planar_edges": "planar",
+    "planar_enforce": "planar",
+    "is_planar_enforced": "planar",
+    "fix_npe_edges": "planar",
+    "insert_intersections": "planar",
+    "self_intersecting_rings": "planar",
+    "check_validity": "planar",
+    "update_validity": "planar",
+    "repair": "pipeline",
+    "check_file": "streaming",
+    "repair_file": "streaming",
+    "isvalid": "valid",
+}
+
+__all__ = list(_EXPORTS)
+
+_SUBMODULES = set(_EXPORTS.values())
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(f"geoplanar.{_EXPORTS[name]}")
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module(f"geoplanar.{name}")
+    raise AttributeError(f"module 'geoplanar' has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 with contextlib.suppress(PackageNotFoundError):
     __version__ = version("geoplanar")
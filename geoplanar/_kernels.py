@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Array kernels shared by the detection and repair functions."""
+
+import numpy as np
+import shapely
+
+
+def isoperimetric_quotient(geoms):
+    """Compute the isoperimetric quotient of an array of geometries.
+
+    Parameters
+    ----------
+    geoms : np.ndarray
+        array of polygon geometries
+
+    Returns
+    -------
+    np.ndarray
+        ``4 * pi * area / perimeter ** 2``, NaN for empty geometries
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 4 * np.pi * shapely.area(geoms) / shapely.length(geoms) ** 2
+
+
+def map_chunks(func, *arrays, n_jobs=1, executor=None):
+    """Apply a vectorized shapely function over chunks of arrays in threads.
+
+    Parameters
+    ----------
+    func : callable
+        vectorized function of the arrays
+    *arrays : np.ndarray
+        arrays of equal length passed to ``func``
+    n_jobs : int, default 1
+        number of chunks
+    executor : concurrent.futures.Executor, optional
+        executor running the chunks; ``func`` is called once on the whole arrays
+        if None
+
+    Returns
+    -------
+    np.ndarray
+        concatenated results
+    """
+    if executor is None or len(arrays[0]) < 2 * n_jobs:
+        return func(*arrays)
+    chunks = zip(*(np.array_split(a, n_jobs) for a in arrays), strict=True)
+    return np.concatenate(list(executor.map(lambda args: func(*args), chunks)))
+
+
+def group_arg(values, groups, largest=True):
+    """Find the position of the extreme value within each group.
+
+    Ties are resolved in favour of the first occurrence and NaN values are only
+    selected if a group has no other value.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        values to compare
+    groups : np.ndarray
+        integer group label of each value
+    largest : bool, default True
+        select the maximum (True) or the minimum (False) of each group
+
+    Returns
+    -------
+    labels : np.ndarray
+        unique group labels, sorted
+    positions : np.ndarray
+        position of the selected value of each group
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=groups.dtype), np.empty(0, dtype=np.intp)
+    values = np.asarray(values, dtype=float)
+    order = np.lexsort((np.arange(len(values)), -values if largest else values, groups))
+    sorted_groups = groups[order]
+    first = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    return sorted_groups[first], order[first]
+
+
+def grouped_union(geoms, groups, coverage=False):
+    """Union the geometries of each group.
+
+    Groups of similar size are unioned together as rows of a padded 2D array, so
+    that each batch is a single vectorized call.
+
+    Parameters
+    ----------
+    geoms : np.ndarray
+        array of geometries
+    groups : np.ndarray
+        integer group label of each geometry
+    coverage : bool, default False
+        use :func:`shapely.coverage_union_all`, which is much faster but only
+        valid if the geometries of each group form a coverage, i.e. they do not
+        overlap and share vertices along their common edges. Batches rejected by
+        GEOS, e.g. because of nearly degenerate slivers, are unioned with
+        :func:`shapely.union_all` instead.
+
+    Returns
+    -------
+    labels : np.ndarray
+        unique group labels, sorted
+    unions : np.ndarray
+        union of the geometries of each group
+    """
+    union = shapely.coverage_union_all if coverage else shapely.union_all
+    order = np.argsort(groups, kind="stable")
+    labels, starts, counts = np.unique(
+        groups[order], return_index=True, return_counts=True
+    )
+    unions = np.empty(len(labels), dtype=object)
+    # bucket the groups by the next power of two of their size to limit padding
+    buckets = np.ceil(np.log2(counts)).astype(int)
+    for bucket in np.unique(buckets):
+        selected = np.flatnonzero(buckets == bucket)
+        sizes = counts[selected]
+        rows = np.repeat(np.arange(len(selected)), sizes)
+        cols = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        padded = np.full((len(selected), sizes.max()), None, dtype=object)
+        padded[rows, cols] = geoms[order[np.repeat(starts[selected], sizes) + cols]]
+        try:
+            unions[selected] = union(padded, axis=1)
+        except shapely.errors.GEOSException:
+            unions[selected] = shapely.union_all(padded, axis=1)
+    return labels, unions
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Spatial index and topology of a polygon layer, shared across calls."""
+
+from functools import cached_property
+
+import numpy as np
+import shapely
+
+from .instrumentation import _stage
+
+__all__ = ["PlanarContext"]
+
+# DE-9IM patterns of the predicates derived from the matrices of intersecting
+# polygons
+_PATTERNS = {
+    "overlaps": "T*T***T**",
+    "contains": "T*****FF*",
+}
+
+# predicate holding for (b, a) whenever the key holds for (a, b)
+_CONVERSE = {
+    None: None,
+    "intersects": "intersects",
+    "overlaps": "overlaps",
+    "touches": "touches",
+    "crosses": "crosses",
+    "dwithin": "dwithin",
+    "contains": "within",
+    "within": "contains",
+    "covers": "covered_by",
+    "covered_by": "covers",
+}
+
+
+class PlanarContext:
+    """Spatial indexes and candidate pairs of a polygon layer.
+
+    Building the context once per layer and passing it to the detection and repair
+    functions with ``context=`` lets them share the spatial indexes and the results
+    of their queries instead of rebuilding them on each call. Everything is
+    computed lazily on first use and cached.
+
+    The context describes the geometries of the layer at the time it was created.
+    Functions returning a modified layer do not update it, so a new context needs
+    to be built for their result, or the context updated with :meth:`update`.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame | GeoSeries
+        polygon layer
+
+    Attributes
+    ----------
+    index : pandas.Index
+        index of the layer
+    geometry : np.ndarray
+        geometries of the layer
+
+    Examples
+    --------
+    >>> context = geoplanar.PlanarContext(gdf)
+    >>> if geoplanar.is_overlapping(gdf, context=context):
+    ...     gdf = geoplanar.trim_overlaps(gdf, context=context)
+    """
+
+    def __init__(self, gdf):
+        self.index = gdf.index
+        self.geometry = np.asarray(gdf.geometry.values)
+        self._pairs = {}
+        self._relate = None
+
+    def __len__(self):
+        return len(self.geometry)
+
+    @cached_property
+    def sindex(self):
+        """shapely.STRtree: spatial index of the geometries"""
+        with _stage("sindex", self.geometry):
+            return shapely.STRtree(self.geometry)
+
+    @cached_property
+    def boundary(self):
+        """np.ndarray: boundaries of the geometries"""
+        with _stage("boundary", self.geometry):
+            return shapely.boundary(self.geometry)
+
+    @cached_property
+    def boundary_sindex(self):
+        """shapely.STRtree: spatial index of the boundaries"""
+        boundary = self.boundary
+        with _stage("boundary_sindex", boundary):
+            return shapely.STRtree(boundary)
+
+    def query(self, predicate=None, distance=None, boundary=False):
+        """Find the pairs of geometries of the layer satisfying a predicate.
+
+        The result is cached and returned as a read-only array.
+
+        Parameters
+        ----------
+        predicate : str, optional
+            predicate of :meth:`shapely.STRtree.query`
+        distance : float, optional
+            distance for the ``"dwithin"`` predicate
+        boundary : bool, default False
+            query the boundaries instead of the geometries
+
+        Returns
+        -------
+        np.ndarray
+            (2, n) array of positions of the pairs, including each geometry paired
+            with itself where the predicate holds
+        """
+        key = (predicate, distance, boundary)
+        if key not in self._pairs:
+            tree = self.boundary_sindex if boundary else self.sindex
+            geoms = self.boundary if boundary else self.geometry
+            with _stage(f"query:{predicate}", geoms):
+                pairs = tree.query(geoms, predicate=predicate, distance=distance)
+            pairs.flags.writeable = False
+            self._pairs[key] = pairs
+        return self._pairs[key]
+
+    def update(self, gdf, changed):
+        """Update the context after some geometries of the layer were modified.
+
+        The boundaries and the cached pairs of the unchanged geometries are kept,
+        and only the modified geometries are queried again. The spatial indexes
+        cannot be modified and are rebuilt on first use, which is cheap compared
+        to the queries. The cached pairs are then sorted by their positions.
+
+        Parameters
+        ----------
+        gdf : GeoDataFrame | GeoSeries
+            modified layer, with the same index
+        changed : array-like of int
+            positions of the modified geometries
+        """
+        if len(gdf) != len(self) or not self.index.equals(gdf.index):
+            raise ValueError("The context was not built for this GeoDataFrame.")
+        changed = np.unique(np.asarray(changed, dtype=np.intp))
+        self.geometry = np.asarray(gdf.geometry.values)
+        if len(changed) == 0:
+            return
+        self.__dict__.pop("sindex", None)
+        self.__dict__.pop("boundary_sindex", None)
+        self._relate = None
+        if "boundary" in self.__dict__:
+            boundary = self.boundary.copy()
+            with _stage("boundary", self.geometry, changed):
+                boundary[changed] = shapely.boundary(self.geometry[changed])
+            self.__dict__["boundary"] = boundary
+
+        unchanged = np.ones(len(self), dtype=bool)
+        unchanged[changed] = False
+        for key in list(self._pairs):
+            predicate, distance, on_boundary = key
+            if predicate not in _CONVERSE:
+                del self._pairs[key]
+                continue
+            pairs = self._pairs[key]
+            kept = pairs[:, unchanged[pairs[0]] & unchanged[pairs[1]]]
+            tree = self.boundary_sindex if on_boundary else self.sindex
+            geoms = (self.boundary if on_boundary else self.geometry)[changed]
+            with _stage(f"query:{predicate}", geoms):
+                i, j = tree.query(geoms, predicate=predicate, distance=distance)
+                # pairs of an unchanged geometry with a changed one
+                converse = _CONVERSE[predicate]
+                if converse == predicate:
+                    k, m = i, j
+                else:
+                    k, m = tree.query(geoms, predicate=converse, distance=distance)
+            mask = unchanged[m]
+            i = np.concatenate([kept[0], changed[i], m[mask]])
+            j = np.concatenate([kept[1], j, changed[k[mask]]])
+            order = np.lexsort((j, i))
+            pairs = np.stack([i[order], j[order]])
+            pairs.flags.writeable = False
+            self._pairs[key] = pairs
+
+    def relate(self):
+        """Compute the DE-9IM matrices of all intersecting pairs in a single pass.
+
+        The ``"overlaps"`` and ``"contains"`` pairs, used by the overlap and
+        interior checks, are derived from the matrices and cached, so that
+        subsequent queries with these predicates do not evaluate them again. The
+        geometries are expected to be polygons.
+
+        Returns
+        -------
+        pairs : np.ndarray
+            (2, n) array of positions of the intersecting pairs, as returned by
+            ``query("intersects")``
+        matrices : np.ndarray
+            (n, 9) array of the characters of the DE-9IM matrix of each pair, as
+            single bytes
+        """
+        if self._relate is None:
+            pairs = self.query("intersects")
+            # a polygon relates to itself as 2FFF1FFF2, only the self-pairs of
+            # polygons without area are evaluated
+            evaluate = pairs[0] != pairs[1]
+            evaluate[~evaluate] = shapely.area(self.geometry[pairs[0, ~evaluate]]) == 0
+            matrices = np.empty((pairs.shape[1], 9), dtype="S1")
+            matrices[~evaluate] = np.frombuffer(b"2FFF1FFF2", dtype="S1")
+            left, right = pairs[:, evaluate]
+            with _stage("relate", self.geometry, left):
+                matrices[evaluate] = _de9im(self.geometry[left], self.geometry[right])
+            for predicate, pattern in _PATTERNS.items():
+                derived = pairs[:, _matches(matrices, pattern)]
+                derived.flags.writeable = False
+                self._pairs.setdefault((predicate, None, False), derived)
+            matrices.flags.writeable = False
+            self._relate = pairs, matrices
+        return self._relate
+
+
+def _de9im(left, right):
+    """Compute the DE-9IM matrices of pairs of geometries as an (n, 9) array of
+    single bytes."""
+    return shapely.relate(left, right).astype("S9").view("S1").reshape(-1, 9)
+
+
+def _matches(matrices, pattern):
+    """Test an (n, 9) array of DE-9IM characters against a pattern."""
+    mask = np.ones(len(matrices), dtype=bool)
+    for k, char in enumerate(pattern):
+        if char == "T":
+            mask &= matrices[:, k] != b"F"
+        elif char != "*":
+            mask &= matrices[:, k] == char.encode()
+    return mask
+
+
+def _get_context(gdf, context=None):
+    """Return the context of a layer, building it if it was not passed.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame | GeoSeries
+        polygon layer
+    context : PlanarContext, optional
+        context passed by the user
+
+    Returns
+    -------
+    PlanarContext
+    """
+    if context is None:
+        return PlanarContext(gdf)
+    if len(context) != len(gdf) or not context.index.equals(gdf.index):
+        raise ValueError("The context was not built for this GeoDataFrame.")
+    return context
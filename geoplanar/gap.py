@@ -1,21 +1,24 @@
 #!/usr/bin/env python3
 #
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import geopandas
 import numpy as np
-import pandas as pd
 import shapely
 from packaging.version import Version
-from collections import defaultdict
-from esda.shape import isoperimetric_quotient
 
+from ._kernels import group_arg, grouped_union, isoperimetric_quotient
+from .context import _get_context
+from .instrumentation import _instrumented, _stage
 
 __all__ = ["gaps", "fill_gaps", "snap"]
 
-GPD_GE_014 = Version(geopandas.__version__) >= Version("0.14.0")
 GPD_GE_100 = Version(geopandas.__version__) >= Version("1.0.0dev")
 
 
-def gaps(gdf):
+@_instrumented
+def gaps(gdf, tiles=None, n_jobs=1, context=None):
     """Find gaps in a geodataframe.
 
     A gap (emply sliver polygon) is a set of points that:
@@ -28,6 +31,19 @@ def gaps(gdf):
 
     gdf :  GeoDataFrame with polygon (multipolygon) GeoSeries
 
+    tiles : int | tuple(int, int), optional
+        If given, split the extent of ``gdf`` into a grid of ``tiles`` x ``tiles``
+        (or ``nx`` x ``ny``) tiles and polygonize each tile separately instead of
+        the whole layer at once. Each tile is read with a halo that is grown until
+        every face touching the tile is complete, so the same gaps as the global
+        computation are returned, possibly in a different order.
+
+    n_jobs : int, default 1
+        Number of processes used to polygonize the tiles. -1 uses all available
+        cores. Ignored if ``tiles`` is None.
+
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
 
     Returns
     -------
@@ -43,24 +59,234 @@ def gaps(gdf):
     >>> h.area
     array([4., 4.])
     """
+    context = _get_context(gdf, context)
+
+    if tiles is not None:
+        with _stage("tiles", context.geometry):
+            found = _tiled_gaps(context.geometry, tiles, n_jobs=n_jobs)
+        return geopandas.GeoSeries(found, crs=gdf.crs)
+
+    with _stage("polygonize", context.boundary):
+        polygons = geopandas.GeoSeries(_faces(context.boundary), crs=gdf.crs)
+    # a face lies either inside or outside of each polygon; testing a point of
+    # its interior does not depend on the rounding of the noded boundaries,
+    # which can leave a face slightly outside the polygon covering it
+    with _stage("within", polygons.values):
+        poly_idx, _ = context.sindex.query(
+            shapely.point_on_surface(polygons.values), predicate="within"
+        )
 
-    polygons = geopandas.GeoSeries(
-        shapely.get_parts(
-            shapely.polygonize(
-                [gdf.boundary.union_all() if GPD_GE_100 else gdf.boundary.unary_union]
-            )
-        ),
-        crs=gdf.crs,
+    return polygons.drop(poly_idx).reset_index(drop=True)
+
+
+def _faces(lines):
+    """Polygonize the noded union of lines into an array of faces."""
+    return shapely.get_parts(shapely.polygonize([shapely.union_all(lines)]))
+
+
+def _tile_grid(bounds, tiles):
+    """Split bounds into a regular grid of tiles.
+
+    Returns
+    -------
+    np.ndarray
+        (n, 4) array of tile bounds, in row-major order
+    (nx, ny) : tuple
+        number of tiles along each axis
+    """
+    nx, ny = (tiles, tiles) if np.isscalar(tiles) else tiles
+    xs = np.linspace(bounds[0], bounds[2], int(nx) + 1)
+    ys = np.linspace(bounds[1], bounds[3], int(ny) + 1)
+    x0, y0 = np.meshgrid(xs[:-1], ys[:-1])
+    x1, y1 = np.meshgrid(xs[1:], ys[1:])
+    grid = np.column_stack([x0.ravel(), y0.ravel(), x1.ravel(), y1.ravel()])
+    return grid, (int(nx), int(ny))
+
+
+def _tile_of(points, bounds, shape):
+    """Find the tile of a (row-major) grid each point falls into.
+
+    Tiles are half-open so that every point is assigned to exactly one tile.
+    """
+    nx, ny = shape
+    width = (bounds[2] - bounds[0]) / nx or 1
+    height = (bounds[3] - bounds[1]) / ny or 1
+    ix = np.clip(np.floor((points[:, 0] - bounds[0]) / width), 0, nx - 1)
+    iy = np.clip(np.floor((points[:, 1] - bounds[1]) / height), 0, ny - 1)
+    return (iy * nx + ix).astype(np.intp)
+
+
+def _window_gaps(polygons, target, window, extent):
+    """Find the gaps touching ``target`` using the polygons intersecting ``window``.
+
+    The boundaries of ``polygons`` are polygonized together with the exterior of
+    ``window``. A face that does not reach the exterior of ``window`` is identical
+    to a face of the whole layer: any boundary crossing it would belong to a
+    polygon intersecting ``window``. A face reaching the exterior of ``window``
+    lies within a single face of the whole layer, which is either the exterior of
+    the layer, if the face extends beyond ``extent``, or a face that requires a
+    larger window.
+
+    Returns
+    -------
+    gaps : np.ndarray | None
+        gaps intersecting ``target``, None if some faces are incomplete
+    window : np.ndarray
+        the window to use in the next attempt
+    """
+    faces = _faces(np.append(shapely.boundary(polygons), shapely.box(*window).exterior))
+    fb = shapely.bounds(faces).reshape(-1, 4)
+    touching = (
+        (fb[:, 0] <= target[2])
+        & (fb[:, 2] >= target[0])
+        & (fb[:, 1] <= target[3])
+        & (fb[:, 3] >= target[1])
+    )
+    inside = (
+        (fb[:, 0] > window[0])
+        & (fb[:, 1] > window[1])
+        & (fb[:, 2] < window[2])
+        & (fb[:, 3] < window[3])
     )
-    if GPD_GE_014:
-        poly_idx, _ = gdf.sindex.query(polygons, predicate="covers")
-    else:
-        poly_idx, _ = gdf.sindex.query_bulk(polygons, predicate="covers")
+    escaping = touching & ~inside
+    # faces reaching beyond the extent of the layer are part of its exterior
+    escaping[escaping] = shapely.covered_by(
+        faces[escaping], shapely.box(*extent)
+    ) & shapely.intersects(faces[escaping], shapely.box(*target))
+    if escaping.any():
+        # grow the window on the sides reached by the incomplete faces
+        fb = fb[escaping]
+        step = max(window[2] - window[0], window[3] - window[1]) / 2
+        grow = np.r_[
+            fb[:, :2].min(axis=0) <= window[:2],
+            fb[:, 2:].max(axis=0) >= window[2:],
+        ]
+        return None, window + grow * np.array([-1, -1, 1, 1]) * step
+
+    faces = faces[touching & inside]
+    faces = faces[shapely.intersects(faces, shapely.box(*target))]
+    # same test as the global computation in gaps
+    covering, _ = shapely.STRtree(polygons).query(
+        shapely.point_on_surface(faces), predicate="within"
+    )
+    return np.delete(faces, covering), window
 
-    return polygons.drop(poly_idx).reset_index(drop=True)
 
+def _gaps_near(polygons, tree, targets, extent):
+    """Find the gaps of a layer intersecting any of a set of boxes.
+
+    Parameters
+    ----------
+    polygons : np.ndarray
+        polygons of the layer
+    tree : shapely.STRtree
+        spatial index of ``polygons``
+    targets : np.ndarray
+        (n, 4) array of the bounds of the boxes
+    extent : np.ndarray
+        bounds of the layer
+
+    Returns
+    -------
+    np.ndarray
+        gaps intersecting any box, each reported once
+    """
+    # degenerate boxes are padded by a small share of the extent so that their
+    # window can grow
+    scale = max(extent[2] - extent[0], extent[3] - extent[1]) or 1.0
+    size = (targets[:, 2:] - targets[:, :2]).max(axis=1, initial=0)
+    pad = np.where(size > 0, 0.1 * size, 1e-6 * scale)
+    windows = targets + pad[:, None] * np.array([-1, -1, 1, 1])
+    found = []
+    for target, window in zip(targets, windows, strict=True):
+        gaps = None
+        while gaps is None:
+            subset = polygons[tree.query(shapely.box(*window), predicate="intersects")]
+            gaps, window = _window_gaps(subset, target, window, extent)
+        found.append(gaps)
+    found = np.concatenate(found) if found else np.empty(0, dtype=object)
+    # gaps intersecting several boxes are found once for each of them
+    _, first = np.unique(shapely.to_wkb(shapely.normalize(found)), return_index=True)
+    return found[np.sort(first)]
+
+
+def _window_gaps_wkb(polygons, target, window, extent):
+    """Run :func:`_window_gaps` on WKB, which is much cheaper to send to a worker
+    process than pickled geometries."""
+    found, window = _window_gaps(shapely.from_wkb(polygons), target, window, extent)
+    return (None if found is None else shapely.to_wkb(found)), window
+
+
+def _tiled_gaps(polygons, tiles, n_jobs=1):
+    """Find gaps tile by tile.
+
+    Parameters
+    ----------
+    polygons : np.ndarray
+        array of polygons
+    tiles : int | tuple(int, int)
+        number of tiles along each axis
+    n_jobs : int
+        number of processes
 
-def fill_gaps(gdf, gap_df=None, strategy='largest', inplace=False):
+    Returns
+    -------
+    np.ndarray
+        gaps of the whole layer, each reported once
+    """
+    if len(polygons) == 0:
+        return np.empty(0, dtype=object)
+    extent = shapely.total_bounds(polygons)
+    grid, shape = _tile_grid(extent, tiles)
+    step = max(grid[0, 2] - grid[0, 0], grid[0, 3] - grid[0, 1])
+    if not step > 0:  # degenerate extent
+        return np.empty(0, dtype=object)
+    tree = shapely.STRtree(polygons)
+    windows = grid + np.array([-1, -1, 1, 1]) * 0.1 * step
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    executor = ProcessPoolExecutor(n_jobs) if n_jobs > 1 else None
+    results = {}
+    pending = np.arange(len(grid))
+    try:
+        while len(pending):
+            subsets = [
+                polygons[tree.query(shapely.box(*window), predicate="intersects")]
+                for window in windows[pending]
+            ]
+            args = (grid[pending], windows[pending], [extent] * len(pending))
+            if executor is None:
+                tile_gaps = map(_window_gaps, subsets, *args)
+            else:
+                tile_gaps = executor.map(
+                    _window_gaps_wkb, map(shapely.to_wkb, subsets), *args
+                )
+            incomplete = []
+            for tile, (found, window) in zip(pending, tile_gaps, strict=True):
+                windows[tile] = window
+                if found is None:
+                    incomplete.append(tile)
+                    continue
+                if executor is not None:
+                    found = shapely.from_wkb(found)
+                # deduplicate gaps shared by neighboring tiles by the tile their
+                # interior point falls into
+                points = shapely.get_coordinates(
+                    shapely.point_on_surface(shapely.normalize(found))
+                )
+                results[tile] = found[_tile_of(points, extent, shape) == tile]
+            pending = np.array(incomplete, dtype=np.intp)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return np.concatenate([results[tile] for tile in range(len(grid))])
+
+
+@_instrumented
+def fill_gaps(
+    gdf, gap_df=None, strategy='largest', inplace=False, bbox=None, context=None
+):
     """Fill gaps in a GeoDataFrame by merging them with neighboring polygons.
 
     Parameters
@@ -79,99 +305,203 @@ def fill_gaps(gdf, gap_df=None, strategy='largest', inplace=False):
           - 'compact' : Merge each gap with the neighboring polygon that results in
                         the new polygon having the highest compactness 
                         (isoperimetric quotient).
-          - None      : Merge each gap with the first available neighboring polygon
-                        (order is indeterminate).
+          - None      : Merge each gap with the first neighboring polygon in the
+                        order of ``gdf``.
+
+        Ties are resolved in favour of the neighbor that comes first in ``gdf``.
 
     inplace : bool, default False
         If True, modify the input GeoDataFrame in place. Otherwise, return a new 
         GeoDataFrame with the gaps filled.
 
+    bbox : tuple(float, float, float, float), optional
+        If given, only fill the gaps intersecting the box ``(minx, miny, maxx,
+        maxy)``. Only the neighborhood of the box is polygonized and only the
+        rows receiving a gap are rewritten. The gaps are filled as they would be
+        by filling all the gaps of the layer.
+
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
     Returns
     -------
     GeoDataFrame or None
         A new GeoDataFrame with gaps filled if `inplace` is False. Otherwise, 
         modifies `gdf` in place and returns None.
     """
-    if gap_df is None:
-        gap_df = gaps(gdf)
+    if len(gdf) == 0:
+        return gdf if inplace else gdf.copy()
+
+    context = _get_context(gdf, context)
+    computed = gap_df is None
+    if computed and bbox is not None:
+        with _stage("gaps", context.geometry):
+            found = _gaps_near(
+                context.geometry,
+                context.sindex,
+                np.asarray([bbox], dtype=float),
+                shapely.total_bounds(context.geometry),
+            )
+        gap_df = geopandas.GeoDataFrame(geometry=found, crs=gdf.crs)
+    elif computed:
+        gap_df = gaps(gdf, context=context)
+    elif bbox is not None:
+        gap_df = gap_df[gap_df.intersects(shapely.box(*bbox))]
 
     if not inplace:
         gdf = gdf.copy()
 
-    if not GPD_GE_014:
-        gap_idx, gdf_idx = gdf.sindex.query_bulk(
-            gap_df.geometry, predicate="intersects"
+    with _stage("query", gap_df.geometry.values):
+        gap_idx, gdf_idx = context.sindex.query(
+            gap_df.geometry.values, predicate="intersects"
         )
-    else:
-        gap_idx, gdf_idx = gdf.sindex.query(gap_df.geometry, predicate="intersects")
 
-    to_merge = defaultdict(set)
-
-    for g_ix in range(len(gap_df)):
-        neighbors = gdf_idx[gap_idx == g_ix]
+    with _stage("select"):
+        # sort the candidates by gap and by position in the layer, so that the
+        # neighbors of each gap form a contiguous block and ties are resolved in
+        # favour of the first neighbor
+        order = np.lexsort((gdf_idx, gap_idx))
+        gap_idx, gdf_idx = gap_idx[order], gdf_idx[order]
 
         if strategy == 'compact':
-            # Find the neighbor that results in the highest IQ
-            gap_geom = shapely.make_valid(gap_df.geometry.iloc[g_ix])
-            best_iq = -1
-            best_neighbor = None
-            neighbor_geometries = gdf.geometry.iloc[neighbors].apply(shapely.make_valid)
-            for neighbor, neighbor_geom in zip(neighbors, neighbor_geometries):
-                combined_geom = shapely.union_all(
-                    [neighbor_geom, gap_geom]
-                )
-                iq = isoperimetric_quotient(combined_geom)
-                if iq > best_iq:
-                    best_iq = iq
-                    best_neighbor = neighbor
-            to_merge[best_neighbor].add(g_ix)
+            # Score every (gap, neighbor) candidate at once and keep the neighbor
+            # that results in the highest IQ for each gap
+            gap_geoms = shapely.make_valid(gap_df.geometry.values)[gap_idx]
+            unique_idx, inverse = np.unique(gdf_idx, return_inverse=True)
+            neighbor_geoms = shapely.make_valid(gdf.geometry.values[unique_idx])
+            neighbor_geoms = neighbor_geoms[inverse]
+            iq = isoperimetric_quotient(shapely.union(neighbor_geoms, gap_geoms))
+            groups, best = group_arg(iq, gap_idx)
         elif strategy is None:  # don't care which polygon we attach cap to
-            to_merge[gdf.index[neighbors[0]]].add(g_ix)
-        elif strategy == 'largest':
-            # Attach to the largest neighbor
-            to_merge[gdf.iloc[neighbors].area.idxmax()].add(g_ix)
+            groups, best = np.unique(gap_idx, return_index=True)
         else:
-            # Attach to the smallest neighbor
-            to_merge[gdf.iloc[neighbors].area.idxmin()].add(g_ix)
-
-    new_geom = []
-    for k, v in to_merge.items():
-        new_geom.append(
-            shapely.union_all(
-                [gdf.geometry.loc[k]] + [gap_df.geometry.iloc[i] for i in v]
-            )
+            # Attach to the largest or the smallest neighbor
+            areas = shapely.area(gdf.geometry.values[gdf_idx])
+            groups, best = group_arg(areas, gap_idx, largest=strategy == 'largest')
+
+    # union each receiving polygon with all of its gaps at once
+    owners = gdf_idx[best]
+    unique_owners = np.unique(owners)
+    geoms = np.asarray(gdf.geometry.values)
+    gap_geoms = np.asarray(gap_df.geometry.values)[groups]
+    with _stage("union", gap_geoms):
+        positions, merged = grouped_union(
+            np.concatenate([geoms[unique_owners], gap_geoms]),
+            np.concatenate([unique_owners, owners]),
         )
-    gdf.loc[list(to_merge.keys()), gdf.geometry.name] = new_geom
+    with _stage("write", merged):
+        gdf.iloc[positions, gdf.columns.get_loc(gdf.geometry.name)] = merged
 
     return gdf
 
 
-def _get_parts(geom):
+def _get_parts(geoms):
     """Get parts recursively to explode multi-part geoms in collections
 
     Parameters
     ----------
-    geom : shapely.Geometry
+    geoms : np.ndarray
+        array of geometries
 
     Returns
     -------
-    np.array[shapely.Geometry]
+    parts : np.array[shapely.Geometry]
+        single-part geometries
+    index : np.ndarray
+        position of the geometry each part comes from
     """
-    parts = shapely.get_parts(geom)
-    if (shapely.get_type_id(parts) > 3).any():
-        return _get_parts(parts)
-    return parts
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    while (shapely.get_type_id(parts) > 3).any():
+        parts, sub_index = shapely.get_parts(parts, return_index=True)
+        index = index[sub_index]
+    return parts, index
 
 
-def _snap(geometry, reference, threshold, segment_length):
-    """Snap g1 to g2 within threshold
+def _segment_tree(polygons, ids):
+    """Index the boundary segments of polygons
 
     Parameters
     ----------
-    geometry : shapely.Polygon
-        geometry to snap
-    reference : shapely.Polygon
-        geometry to snap to
+    polygons : np.array[shapely.Polygon]
+        polygons to index
+    ids : np.ndarray
+        id of each polygon
+
+    Returns
+    -------
+    tree : shapely.STRtree
+        tree of the segments
+    starts, ends : np.ndarray
+        coordinates of the start and end point of each segment
+    owners : np.ndarray
+        id of the polygon each segment belongs to
+    """
+    rings, ring_owner = shapely.get_rings(polygons, return_index=True)
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    segment = np.flatnonzero(ring_index[:-1] == ring_index[1:])
+    starts, ends = coords[segment], coords[segment + 1]
+    tree = shapely.STRtree(shapely.linestrings(np.stack([starts, ends], axis=1)))
+    return tree, starts, ends, ids[ring_owner[ring_index[segment]]]
+
+
+def _nearest_on_segments(coords, targets, segments, threshold):
+    """Find the nearest point on the boundary of its target for each coordinate
+
+    Only the segments within ``threshold`` are measured.
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        (n, 2) array of coordinates
+    targets : np.ndarray
+        id of the target polygon of each coordinate
+    segments : tuple
+        segments of the target polygons as returned by :func:`_segment_tree`
+    threshold : float
+        max distance to look for the nearest point
+
+    Returns
+    -------
+    positions : np.ndarray
+        positions of the coordinates closer than ``threshold`` to their target
+    nearest : np.ndarray
+        the nearest points on the boundary of the target of these coordinates
+    """
+    tree, starts, ends, owners = segments
+    point, segment = tree.query(
+        shapely.points(coords), predicate="dwithin", distance=threshold
+    )
+    own = owners[segment] == targets[point]
+    point, segment = point[own], segment[own]
+
+    # project the points onto the segments
+    start = starts[segment]
+    vector = ends[segment] - start
+    length = (vector**2).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = ((coords[point] - start) * vector).sum(axis=1) / length
+    t = np.where(length > 0, np.clip(t, 0, 1), 0)
+    nearest = start + t[:, None] * vector
+    distance = np.hypot(*(nearest - coords[point]).T)
+
+    positions, closest = group_arg(distance, point, largest=False)
+    within = distance[closest] < threshold
+    return positions[within], nearest[closest[within]]
+
+
+def _snap(geoms, targets, references, segments, threshold, segment_length):
+    """Snap each geometry to its reference within threshold
+
+    Parameters
+    ----------
+    geoms : np.array[shapely.Polygon]
+        geometries to snap
+    targets : np.ndarray
+        position of the reference of each geometry in ``references``
+    references : np.array[shapely.Polygon]
+        geometries to snap to
+    segments : tuple
+        segments of the references as returned by :func:`_segment_tree`
     threshold : float
         max distance between vertices to snap
     segment_length : float
@@ -179,41 +509,66 @@ def _snap(geometry, reference, threshold, segment_length):
 
     Returns
     -------
-    shapely.Polygon
-        snapped geometry
+    np.array[shapely.Polygon]
+        snapped geometries
     """
+    # segmentize the shells and extract coordinates of all of them at once
+    shells = shapely.segmentize(shapely.get_exterior_ring(geoms), segment_length)
+    coords, index = shapely.get_coordinates(shells, return_index=True)
+    targets = targets[index]
+    # vertices inside their reference are already snapped; only those within its
+    # extent need to be tested
+    bounds = shapely.bounds(references)[targets]
+    candidate = np.flatnonzero(
+        (coords >= bounds[:, :2]).all(axis=1) & (coords <= bounds[:, 2:]).all(axis=1)
+    )
+    distance_mask = np.zeros(len(coords), dtype=bool)
+    distance_mask[candidate] = shapely.intersects_xy(
+        references[targets[candidate]], *coords[candidate].T
+    )
+    # find the nearest point on the reference boundary of the others, which are
+    # too far from it unless they are within threshold of its extent
+    near = (coords > bounds[:, :2] - threshold).all(axis=1) & (
+        coords < bounds[:, 2:] + threshold
+    ).all(axis=1)
+    outside = np.flatnonzero(near & ~distance_mask)
+    positions, nearest = _nearest_on_segments(
+        coords[outside], targets[outside], segments, threshold
+    )
+    distance_mask[outside[positions]] = True
 
-    # extract the shell and holes from the first geometry
-    shell, holes = geometry.exterior, geometry.interiors
-    # segmentize the shell and extract coordinates
-    coords = shapely.get_coordinates(shapely.segmentize(shell, segment_length))
-    # create a point geometry from the coordinates
-    points = shapely.points(coords)
-    # find the shortest line between the points and the second geometry
-    lines = shapely.shortest_line(points, reference)
-    # mask the coordinates where the distance is less than the threshold
-    distance_mask = shapely.length(lines) < threshold
-
-    # return the original geometry if no coordinates are within the threshold
-    if not any(distance_mask):
-        return geometry
+    # keep the original geometries if no coordinates are within the threshold
+    snapped = geoms.copy()
+    changed = np.bincount(index[distance_mask], minlength=len(geoms)) > 0
+    if not changed.any():
+        return snapped
 
     # update the coordinates with the snapped coordinates
-    coords[distance_mask] = shapely.get_coordinates(lines)[1::2][distance_mask]
-    # re-create the polygon with new coordinates and original holes and simplify
+    coords[outside[positions]] = nearest
+    keep = changed[index]
+    coords, index = coords[keep], index[keep]
+    # re-create the polygons with new shells and original holes and simplify
     # to remove any extra vertices.
-    polygon = shapely.Polygon(coords, holes=holes)
-    simplified = shapely.make_valid(shapely.simplify(polygon, segment_length / 100))
+    rings, ring_index = shapely.get_rings(geoms[changed], return_index=True)
+    shell = np.r_[True, ring_index[1:] != ring_index[:-1]]
+    rings[shell] = shapely.linearrings(
+        coords, indices=np.unique(index, return_inverse=True)[1]
+    )
+    polygons = shapely.polygons(rings, indices=ring_index)
+    simplified = shapely.make_valid(shapely.simplify(polygons, segment_length / 100))
     # the function may return invalid and make_valid may return non-polygons
     # the largest polygon is the most likely the one we want
-    if simplified.geom_type != "Polygon":
-        parts = _get_parts(simplified)
-        simplified = parts[np.argmax(shapely.area(parts))]
-
-    return simplified
+    multi = np.flatnonzero(shapely.get_type_id(simplified) != 3)
+    if len(multi):
+        parts, part_index = _get_parts(simplified[multi])
+        groups, largest = group_arg(shapely.area(parts), part_index)
+        simplified[multi[groups]] = parts[largest]
+    snapped[changed] = simplified
+    return snapped
 
 
-def snap(geometry, threshold):
+@_instrumented
+def snap(geometry, threshold, context=None):
     """Snap geometries that are within threshold to each other
 
     Only one of the pair of geometries identified as nearby will be snapped,
@@ -232,6 +587,8 @@ def snap(geometry, threshold):
         max distance between geometries to snap
         threshold should be ~10% larger than the distance between polygon edges to
         ensure snapping
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``geometry``, built if not given
 
     Returns
     -------
@@ -241,55 +598,44 @@ def snap(geometry, threshold):
     if not GPD_GE_100:
         raise ImportError("geopandas 1.0.0 or higher is required.")
 
-    nearby_a, nearby_b = geometry.sindex.query(
-        geometry.geometry, predicate="dwithin", distance=threshold
-    )
-    overlap_a, overlap_b = geometry.boundary.sindex.query(
-        geometry.boundary, predicate="overlaps"
-    )
-
-    self_mask = nearby_a != nearby_b
-    nearby_a = nearby_a[self_mask]
-    nearby_b = nearby_b[self_mask]
-
-    self_mask = overlap_a != overlap_b
-    overlap_a = overlap_a[self_mask]
-    overlap_b = overlap_b[self_mask]
+    context = _get_context(geometry, context)
+    nearby_a, nearby_b = context.query("dwithin", distance=threshold)
+    overlap_a, overlap_b = context.query("overlaps", boundary=True)
+
+    # drop pairs sharing a boundary and keep each pair once, with the lower index
+    # as the source, ordered by source and target
+    n = len(geometry)
+    nearby = np.minimum(nearby_a, nearby_b) * n + np.maximum(nearby_a, nearby_b)
+    overlap = overlap_a * n + overlap_b
+    nearby = nearby[(nearby_a != nearby_b) & ~np.isin(nearby, overlap)]
+    first = np.sort(np.unique(nearby, return_index=True)[1])
+    source, target = np.divmod(nearby[first], n)
+    order = np.lexsort((target, source))
+    source, target = source[order], target[order]
+
+    geoms = context.geometry
+    snapped = geoms.copy()
+    # index the boundary segments of all targets once
+    ids = np.unique(target)
+    targets = geoms[ids]
+    with _stage("segments", targets):
+        shapely.prepare(targets)
+        segments = _segment_tree(targets, ids)
+    # snap each source to its targets in order, one target per source in each round
+    rank = np.arange(len(source)) - np.searchsorted(source, source)
+    for k in range(rank.max() + 1 if len(rank) else 0):
+        in_round = rank == k
+        src = source[in_round]
+        with _stage("snap", snapped, src):
+            snapped[src] = _snap(
+                snapped[src],
+                target[in_round],
+                geoms,
+                segments,
+                threshold=threshold,
+                segment_length=threshold,
+            )
 
-    nearby = pd.MultiIndex.from_arrays([nearby_a, nearby_b], names=("source", "target"))
-    overlap = pd.MultiIndex.from_arrays(
-        [overlap_a, overlap_b], names=("source", "target")
+    return geopandas.GeoSeries(
+        snapped, index=geometry.index, crs=geometry.crs, name=geometry.geometry.name
     )
-    nearby_not_overlap = nearby.difference(overlap)
-    if not nearby_not_overlap.empty:
-        duplicated = pd.DataFrame(
-            np.sort(np.array(nearby_not_overlap.to_list()), axis=1)
-        ).duplicated()
-        pairs_to_snap = nearby_not_overlap[~duplicated]
-
-        new_geoms = []
-        previous_geom = None
-        snapped_geom = None
-        for geom, ref in zip(
-            geometry.geometry.iloc[pairs_to_snap.get_level_values("source")],
-            geometry.geometry.iloc[pairs_to_snap.get_level_values("target")],
-            strict=True,
-        ):
-            if previous_geom == geom:
-                new_geoms.append(
-                    _snap(
-                        snapped_geom, ref, threshold=threshold, segment_length=threshold
-                    )
-                )
-            else:
-                snapped_geom = _snap(
-                    geom, ref, threshold=threshold, segment_length=threshold
-                )
-                new_geoms.append(snapped_geom)
-                previous_geom = geom
-
-        snapped = geometry.geometry.copy()
-        snapped.iloc[pairs_to_snap.get_level_values("source")] = new_geoms
-    else:
-        snapped = geometry.geometry.copy()
-    return snapped
@@ -1,15 +1,17 @@
 #!/usr/bin/env python3
 #
-import geopandas
-import pandas as pd
-from packaging.version import Version
+import numpy as np
+import shapely
 
-__all__ = ["add_interiors", "missing_interiors"]
+from ._kernels import grouped_union
+from .context import _get_context
+from .instrumentation import _instrumented, _stage
 
-GPD_GE_014 = Version(geopandas.__version__) >= Version("0.14.0")
+__all__ = ["add_interiors", "missing_interiors"]
 
 
-def missing_interiors(gdf):
+@_instrumented
+def missing_interiors(gdf, context=None):
     """Find any missing interiors.
 
     For a planar enforced polygon layer, there should be no cases of a polygon
@@ -22,13 +24,16 @@ def missing_interiors(gdf):
 
     gdf :  GeoDataFrame with polygon (multipolygon) GeoSeries
 
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
 
     Returns
     -------
 
-    pairs : list
-           tuples for each violation (i,j), where i is the index of the
-           containing polygon, j is the index of the contained polygon
+    pairs : np.ndarray
+           (2, k) array of the positions of each violation, where the first row
+           holds the containing polygon, the second the contained polygon
 
     Examples
     --------
@@ -38,25 +43,68 @@ def missing_interiors(gdf):
     >>> gdf = geopandas.GeoDataFrame(geometry=[p1,p2,p3])
     >>> mi = geoplanar.missing_interiors(gdf)
     >>> mi
-    [(0, 1), (0, 2)]
+    array([[0, 0],
+           [1, 2]])
     """
-    if GPD_GE_014:
-        i, j = gdf.geometry.sindex.query(gdf.geometry, predicate="contains")
-    else:
-        i, j = gdf.geometry.sindex.query_bulk(gdf.geometry, predicate="contains")
+    pairs = _get_context(gdf, context).query("contains")
 
-    mask = i != j
+    return pairs[:, pairs[0] != pairs[1]]
 
-    return list(zip(i[mask], j[mask], strict=True))
 
+def _direct_children(pairs, n):
+    """Keep the containment pairs of each polygon and its direct children.
+
+    A contained polygon is a direct child of a container unless another of its
+    containers lies in that container. Polygons containing each other, i.e. equal
+    geometries, are not treated as missing interiors.
+
+    Parameters
+    ----------
+    pairs : np.ndarray
+        (2, k) array of the positions of the containing and contained polygons
+    n : int
+        number of polygons
 
-def add_interiors(gdf, inplace=False):
+    Returns
+    -------
+    parents, children : np.ndarray
+        positions of the containers and of their direct children
+    """
+    i, j = pairs
+    keys = i * n + j
+    keep = ~np.isin(j * n + i, keys)
+    i, j, keys = i[keep], j[keep], keys[keep]
+    if len(i) == 0:
+        return i, j
+
+    # group the containers of each polygon; the size of a group is the nesting
+    # depth of the polygon
+    order = np.lexsort((i, j))
+    i, j = i[order], j[order]
+    labels, starts, depth = np.unique(j, return_index=True, return_counts=True)
+    size = np.repeat(depth, depth)
+    rank = np.arange(len(j)) - np.repeat(starts, depth)
+    start = np.repeat(starts, depth)
+
+    # compare each container with the other containers of the same polygon, one
+    # nesting level at a time
+    indirect = np.zeros(len(i), dtype=bool)
+    for offset in range(1, depth.max()):
+        selected = np.flatnonzero(size > offset)
+        other = i[start[selected] + (rank[selected] + offset) % size[selected]]
+        indirect[selected] |= np.isin(i[selected] * n + other, keys)
+    return i[~indirect], j[~indirect]
+
+
+@_instrumented
+def add_interiors(gdf, inplace=False, context=None):
     """Add any missing interiors.
 
     For a planar enforced polygon layer, there should be no cases of a polygon
     being contained in another polygon. Instead the "contained" polygon is a
     hole in the "containing" polygon. This function finds and corrects any such
-    violations.
+    violations. Nested polygons become holes of their innermost container only,
+    so that a polygon inside a contained polygon is not cut twice.
 
 
     Parameters
@@ -68,6 +116,9 @@ def add_interiors(gdf, inplace=False):
     inplace: boolean (default: False)
           Change the geoseries of current dataframe
 
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
 
     Returns
     -------
@@ -87,29 +138,31 @@ def add_interiors(gdf, inplace=False):
     2     4.0
     >>> mi = geoplanar.missing_interiors(gdf)
     >>> mi
-    [(0, 1), (0, 2)]
+    array([[0, 0],
+           [1, 2]])
     >>> gdf1 = geoplanar.add_interiors(gdf)
     >>> gdf1.area
     0    92.0
     1     4.0
     2     4.0
     """
+    contained = missing_interiors(gdf, context=context)
+
     if not inplace:
         gdf = gdf.copy()
 
-    geom_col_idx = gdf.columns.get_loc(gdf.geometry.name)
-
-    if GPD_GE_014:
-        contained = gdf.geometry.sindex.query(gdf.geometry, predicate="contains")
-    else:
-        contained = gdf.geometry.sindex.query_bulk(gdf.geometry, predicate="contains")
-    k = contained.shape[1]
-
-    if k > gdf.shape[0]:
-        to_add = contained[:, contained[0] != contained[1]].T
-        for add in to_add:
-            i, j = add
-            gdf.iloc[i, geom_col_idx] = gdf.geometry.iloc[i].difference(
-                gdf.geometry.iloc[j]
-            )
+    with _stage("nesting"):
+        parents, children = _direct_children(contained, len(gdf))
+    if len(parents) == 0:
+        return gdf
+
+    # each container loses the union of its direct children in a single
+    # difference; nested children are holes in their own parents instead
+    geoms = np.asarray(gdf.geometry.values)
+    with _stage("difference", geoms, children):
+        labels, unions = grouped_union(geoms[children], parents)
+        interiors = shapely.difference(geoms[labels], unions)
+    with _stage("write", interiors):
+        geom_col_idx = gdf.columns.get_loc(gdf.geometry.name)
+        gdf.iloc[labels, geom_col_idx] = interiors
     return gdf
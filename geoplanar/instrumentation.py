@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Opt-in timing of the internal stages of the geoplanar functions."""
+
+import contextlib
+import functools
+import json
+import time
+from contextvars import ContextVar
+
+import numpy as np
+import shapely
+
+__all__ = ["Instrumentation", "instrument"]
+
+_RECORDER = ContextVar("geoplanar_recorder", default=None)
+_FUNCTION = ContextVar("geoplanar_function", default=None)
+
+
+class Instrumentation:
+    """Records of the stages run while instrumentation is active.
+
+    Created by :func:`instrument`. Each record describes one run of a stage of a
+    geoplanar function:
+
+    - ``function``: name of the innermost public function running the stage
+    - ``stage``: name of the stage, ``"total"`` for the whole function call
+    - ``seconds``: wall time
+    - ``geometries``: number of geometries the stage processes, if known
+    - ``vertices``: number of vertices of those geometries, if known
+
+    Attributes
+    ----------
+    records : list of dict
+        records in the order the stages completed
+    """
+
+    def __init__(self, callback=None):
+        self.records = []
+        self._callback = callback
+
+    def _add(self, record):
+        self.records.append(record)
+        if self._callback is not None:
+            self._callback(record)
+
+    def to_dict(self):
+        """Aggregate the records by function and stage.
+
+        Returns
+        -------
+        dict
+            ``{function: {stage: {"calls", "seconds", "geometries", "vertices"}}}``
+            with the number of runs and the sums over them
+        """
+        summary = {}
+        for record in self.records:
+            stages = summary.setdefault(record["function"], {})
+            stage = stages.setdefault(
+                record["stage"],
+                {"calls": 0, "seconds": 0.0, "geometries": 0, "vertices": 0},
+            )
+            stage["calls"] += 1
+            stage["seconds"] += record["seconds"]
+            stage["geometries"] += record["geometries"] or 0
+            stage["vertices"] += record["vertices"] or 0
+        return summary
+
+    def to_jsonl(self, path=None):
+        """Export the records as JSON lines.
+
+        Parameters
+        ----------
+        path : str | os.PathLike, optional
+            file the lines are appended to
+
+        Returns
+        -------
+        str | None
+            the lines if ``path`` is not given
+        """
+        text = "".join(json.dumps(record) + "\n" for record in self.records)
+        if path is None:
+            return text
+        with open(path, "a") as f:
+            f.write(text)
+        return None
+
+
+@contextlib.contextmanager
+def instrument(callback=None):
+    """Record the time spent in each stage of the geoplanar functions.
+
+    Instrumentation is scoped to the current thread or task, and nested blocks
+    record into the innermost one. Outside of this context manager, the stages
+    are not timed and cost nothing.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        called with each record as soon as its stage completes
+
+    Yields
+    ------
+    Instrumentation
+        the records of the block
+
+    Examples
+    --------
+    >>> with geoplanar.instrument() as stats:
+    ...     gdf = geoplanar.fill_gaps(gdf)
+    >>> stats.to_dict()["fill_gaps"]["total"]["calls"]
+    1
+    """
+    recorder = Instrumentation(callback)
+    token = _RECORDER.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _RECORDER.reset(token)
+
+
+def _count(geoms):
+    """Count the geometries of an array and their vertices."""
+    if geoms is None:
+        return None, None
+    geoms = np.asarray(geoms)
+    return len(geoms), int(shapely.get_num_coordinates(geoms).sum())
+
+
+@contextlib.contextmanager
+def _record(recorder, function, stage, geoms):
+    geometries, vertices = _count(geoms)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder._add(
+            {
+                "function": function,
+                "stage": stage,
+                "seconds": time.perf_counter() - start,
+                "geometries": geometries,
+                "vertices": vertices,
+            }
+        )
+
+
+def _stage(name, geoms=None, index=None):
+    """Time a stage of the running function if instrumentation is active.
+
+    The geometries are only selected and counted while recording, so that an
+    inactive stage does not copy them.
+
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    geoms : array_like | callable, optional
+        geometries processed by the stage, counted with their vertices, or a
+        function without arguments returning them
+    index : array_like, optional
+        positions or boolean mask selecting the processed geometries in ``geoms``
+
+    Returns
+    -------
+    contextlib.AbstractContextManager
+    """
+    recorder = _RECORDER.get()
+    if recorder is None:
+        return contextlib.nullcontext()
+    if callable(geoms):
+        geoms = geoms()
+    if index is not None:
+        geoms = geoms[index]
+    return _record(recorder, _FUNCTION.get(), name, geoms)
+
+
+def _instrumented(func):
+    """Record the calls of a public function and attribute its stages to it."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        recorder = _RECORDER.get()
+        if recorder is None:
+            return func(*args, **kwargs)
+        layer = args[0] if args else kwargs.get("gdf")
+        geoms = getattr(layer, "geometry", None)
+        geoms = None if geoms is None else geoms.values
+        token = _FUNCTION.set(func.__name__)
+        try:
+            with _record(recorder, func.__name__, "total", geoms):
+                return func(*args, **kwargs)
+        finally:
+            _FUNCTION.reset(token)
+
+    return wrapper
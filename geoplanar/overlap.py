@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
-from collections import defaultdict
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 import geopandas
-import libpysal
 import numpy as np
-from packaging.version import Version
-from esda.shape import isoperimetric_quotient
+import pandas
+import shapely
+
+from ._kernels import group_arg, grouped_union, isoperimetric_quotient, map_chunks
+from .context import _get_context
+from .instrumentation import _instrumented, _stage
 
 __all__ = [
     "overlaps",
@@ -15,25 +19,27 @@ __all__ = [
     "merge_touching",
 ]
 
-GPD_GE_014 = Version(geopandas.__version__) >= Version("0.14.0")
-
 
-def overlaps(gdf):
+@_instrumented
+def overlaps(gdf, context=None):
     """Check for overlapping geometries in the GeoDataFrame.
 
     Parameters
     ----------
     gdf:  GeoDataFrame with polygon geometries
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
 
     Returns:
     array-like: Pairs of indices with overlapping geometries.
     """
-    if GPD_GE_014:
-        return gdf.sindex.query(gdf.geometry, predicate="overlaps")
-    return gdf.sindex.query_bulk(gdf.geometry, predicate="overlaps")
+    return _get_context(gdf, context).query("overlaps")
 
 
-def trim_overlaps(gdf, strategy='largest', inplace=False):
+@_instrumented
+def trim_overlaps(
+    gdf, strategy='largest', inplace=False, n_jobs=1, bbox=None, context=None
+):
     """Trim overlapping polygons
 
     Note
@@ -42,6 +48,11 @@ def trim_overlaps(gdf, strategy='largest', inplace=False):
     typically a result of a complex relationship between geometries and is expected.
     Just note, that it may require further treatment if simple Polygons are needed.
 
+    Overlapping pairs are resolved in batches that share no polygon, so that each
+    batch is trimmed with a single vectorized call while the result remains
+    identical to resolving the pairs one by one, in the order of the positions of
+    their polygons. Polygons that only touch are not trimmed.
+
     Parameters
     ----------
 
@@ -54,77 +65,222 @@ def trim_overlaps(gdf, strategy='largest', inplace=False):
           - 'compact' : Trim the polygon yielding the most compact modified polygon.
                             (isoperimetric quotient).
           - None      : Trim either polygon non-deterministically but performantly.
-    
+
+    inplace : bool, default False
+        If True, modify the input GeoDataFrame in place.
+
+    n_jobs : int, default 1
+        Number of threads used to trim each batch. -1 uses all available cores.
+
+    bbox : tuple(float, float, float, float), optional
+        If given, only trim the polygons intersecting the box ``(minx, miny, maxx,
+        maxy)`` and the polygons overlapping them, directly or through other
+        overlapping polygons. These polygons are trimmed as they would be by
+        trimming the whole layer and the other rows are left untouched.
+
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
     Returns
     -------
 
     gdf: geodataframe with corrected geometries
 
     """
-    if GPD_GE_014:
-        intersections = gdf.sindex.query(gdf.geometry, predicate="intersects").T
+    if strategy not in ("largest", "smallest", "compact", None):
+        raise ValueError(
+            "strategy must be one of 'largest', 'smallest', 'compact' or None, "
+            f"got {strategy!r}"
+        )
+    context = _get_context(gdf, context)
+    if bbox is None:
+        selected = None
+        intersections = context.query("intersects")
     else:
-        intersections = gdf.sindex.query_bulk(gdf.geometry, predicate="intersects").T
+        with _stage("region"):
+            selected, intersections = _region_pairs(context, bbox)
 
     if not inplace:
         gdf = gdf.copy()
 
     geom_col_idx = gdf.columns.get_loc(gdf.geometry.name)
 
-    if strategy is None:  # don't care which polygon to trim
-        for i, j in intersections:
-            if i != j:
-                left = gdf.geometry.iloc[i]
-                right = gdf.geometry.iloc[j]
-                gdf.iloc[j, geom_col_idx] = right.difference(left)
-    elif strategy=='largest':
-        for i, j in intersections:
-            if i != j:
-                left = gdf.geometry.iloc[i]
-                right = gdf.geometry.iloc[j]
-                if left.area > right.area:  # trim left
-                    gdf.iloc[i, geom_col_idx] = left.difference(right)
-                else:
-                    gdf.iloc[j, geom_col_idx] = right.difference(left)
-    elif strategy=='smallest':
-        for i, j in intersections:
-            if i != j:
-                left = gdf.geometry.iloc[i]
-                right = gdf.geometry.iloc[j]
-                if left.area < right.area:  # trim left
-                    gdf.iloc[i, geom_col_idx] = left.difference(right)
-                else:
-                    gdf.iloc[j, geom_col_idx] = right.difference(left)
-    elif strategy=='compact':
-         for i, j in intersections:
-             if i != j:
-                 left = gdf.geometry.iloc[i]
-                 right = gdf.geometry.iloc[j]
-                 left_c = left.difference(right)
-                 right_c = right.difference(left)
-                 iq_left = isoperimetric_quotient(left_c)
-                 iq_right = isoperimetric_quotient(right_c)
-                 if iq_left > iq_right:  # trimming left is more compact than right
-                     gdf.iloc[i, geom_col_idx] = left_c
-                 else:
-                     gdf.iloc[j, geom_col_idx] = right_c
+    geoms = np.array(gdf.geometry.values, dtype=object)
+    changed = _trim(geoms, intersections[0], intersections[1], strategy, n_jobs)
+    if selected is not None:
+        changed &= selected
+    if changed.any():
+        with _stage("write", geoms, changed):
+            gdf.iloc[np.flatnonzero(changed), geom_col_idx] = geoms[changed]
     return gdf
 
 
-def is_overlapping(gdf):
+def _region_pairs(context, bbox):
+    """Find the intersecting pairs involved in trimming the polygons of a region.
+
+    Parameters
+    ----------
+    context : PlanarContext
+        context of the layer
+    bbox : tuple(float, float, float, float)
+        bounds of the region
+
+    Returns
+    -------
+    selected : np.ndarray
+        boolean mask of the polygons intersecting ``bbox`` and of the polygons
+        whose interior intersects them, directly or through other polygons
+    pairs : np.ndarray
+        (2, n) array of the intersecting pairs involving a selected polygon, in
+        the order of ``context.query("intersects")``
+    """
+    geoms, tree = context.geometry, context.sindex
+    selected = np.zeros(len(geoms), dtype=bool)
+    frontier = tree.query(shapely.box(*bbox), predicate="intersects")
+    while len(frontier):
+        selected[frontier] = True
+        i, j = tree.query(geoms[frontier], predicate="intersects")
+        # touching polygons are not modified by trimming each other
+        j = j[~shapely.touches(geoms[frontier[i]], geoms[j])]
+        frontier = np.unique(j[~selected[j]])
+
+    # pairs are listed by their first polygon, in the order of the spatial index
+    _, neighbors = tree.query(geoms[selected], predicate="intersects")
+    inputs = np.union1d(np.flatnonzero(selected), neighbors)
+    i, j = tree.query(geoms[inputs], predicate="intersects")
+    i = inputs[i]
+    mask = selected[i] | selected[j]
+    return selected, np.stack([i[mask], j[mask]])
+
+
+def _conflict_free_batches(left, right):
+    """Assign each pair to the earliest batch not sharing a polygon with it.
+
+    A pair is always placed after every preceding pair that involves either of its
+    polygons, so processing the batches in order reproduces the sequential order
+    of operations on each polygon.
+
+    Parameters
+    ----------
+    left, right : np.ndarray
+        positional indices of the pairs
+
+    Returns
+    -------
+    np.ndarray
+        batch number of each pair
+    """
+    if len(left) == 0:
+        return np.empty(0, dtype=np.intp)
+    last = [-1] * (int(max(left.max(), right.max())) + 1)
+    batches = np.empty(len(left), dtype=np.intp)
+    for k, (i, j) in enumerate(zip(left.tolist(), right.tolist(), strict=True)):
+        b = max(last[i], last[j]) + 1
+        last[i] = last[j] = batches[k] = b
+    return batches
+
+
+def _trim(geoms, left, right, strategy, n_jobs=1):
+    """Trim overlapping pairs of an array of geometries in place.
+
+    Parameters
+    ----------
+    geoms : np.ndarray
+        object array of geometries, modified in place
+    left, right : np.ndarray
+        positional indices of intersecting pairs
+    strategy : {'smallest', 'largest', 'compact', None}
+        strategy to determine which polygon of a pair to trim
+    n_jobs : int
+        number of threads used to trim each batch
+
+    Returns
+    -------
+    np.ndarray
+        boolean mask of modified geometries
+    """
+    changed = np.zeros(len(geoms), dtype=bool)
+    # trimming only removes area, so polygons that only touch never overlap
+    mask = left != right
+    mask[mask] = ~shapely.touches(geoms[left[mask]], geoms[right[mask]])
+    left, right = left[mask], right[mask]
+    if len(left) == 0:
+        return changed
+    # resolve the pairs in the order of the positions of their polygons rather
+    # than in the order of the spatial index, which depends on the whole layer
+    order = np.lexsort((right, left))
+    left, right = left[order], right[order]
+
+    with _stage("batches"):
+        batches = _conflict_free_batches(left, right)
+    order = np.argsort(batches, kind="stable")
+    offsets = np.searchsorted(batches[order], np.arange(batches.max() + 2))
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    executor = ThreadPoolExecutor(n_jobs) if n_jobs > 1 else None
+    try:
+        for start, stop in zip(offsets[:-1], offsets[1:], strict=True):
+            i = left[order[start:stop]]
+            j = right[order[start:stop]]
+            with _stage("trim", geoms, i):
+                if strategy == "compact":
+                    left_c = map_chunks(
+                        shapely.difference,
+                        geoms[i],
+                        geoms[j],
+                        n_jobs=n_jobs,
+                        executor=executor,
+                    )
+                    right_c = map_chunks(
+                        shapely.difference,
+                        geoms[j],
+                        geoms[i],
+                        n_jobs=n_jobs,
+                        executor=executor,
+                    )
+                    # trim left if that is more compact than trimming right
+                    iq_left = isoperimetric_quotient(left_c)
+                    iq_right = isoperimetric_quotient(right_c)
+                    trim_left = iq_left > iq_right
+                    target = np.where(trim_left, i, j)
+                    trimmed = np.where(trim_left, left_c, right_c)
+                else:
+                    if strategy is None:  # don't care which polygon to trim
+                        trim_left = np.zeros(len(i), dtype=bool)
+                    elif strategy == "largest":
+                        trim_left = shapely.area(geoms[i]) > shapely.area(geoms[j])
+                    else:
+                        trim_left = shapely.area(geoms[i]) < shapely.area(geoms[j])
+                    target = np.where(trim_left, i, j)
+                    trimmed = map_chunks(
+                        shapely.difference,
+                        geoms[target],
+                        geoms[np.where(trim_left, j, i)],
+                        n_jobs=n_jobs,
+                        executor=executor,
+                    )
+                geoms[target] = trimmed
+                changed[target] = True
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return changed
+
+
+@_instrumented
+def is_overlapping(gdf, context=None):
     "Test for overlapping features in geoseries."
 
-    if GPD_GE_014:
-        overlaps = gdf.sindex.query(gdf.geometry, predicate="overlaps")
-    else:
-        overlaps = gdf.sindex.query_bulk(gdf.geometry, predicate="overlaps")
+    overlaps = _get_context(gdf, context).query("overlaps")
 
     if overlaps.shape[1] > 0:
         return True
     return False
 
 
-def merge_overlaps(gdf, merge_limit, overlap_limit):
+@_instrumented
+def merge_overlaps(gdf, merge_limit, overlap_limit, context=None):
     """Merge overlapping polygons based on a set of conditions.
 
     Overlapping polygons smaller than ``merge_limit`` are merged to a neighboring
@@ -147,20 +303,17 @@ def merge_overlaps(gdf, merge_limit, overlap_limit):
     overlap_limit : float (0-1)
         ratio of area of an overlapping polygon that has to be shared with other polygon
         to merge both into one
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
 
     Returns
     -------
 
     GeoDataFrame
     """
-    if GPD_GE_014:
-        overlap_a, overlap_b = gdf.sindex.query(gdf.geometry, predicate="overlaps")
-        contains_a, contains_b = gdf.sindex.query(gdf.geometry, predicate="contains")
-    else:
-        overlap_a, overlap_b = gdf.sindex.query_bulk(gdf.geometry, predicate="overlaps")
-        contains_a, contains_b = gdf.sindex.query_bulk(
-            gdf.geometry, predicate="contains"
-        )
+    context = _get_context(gdf, context)
+    overlap_a, overlap_b = context.query("overlaps")
+    contains_a, contains_b = context.query("contains")
 
     self_mask = contains_a != contains_b
     contains_a = contains_a[self_mask]
@@ -170,35 +323,28 @@ def merge_overlaps(gdf, merge_limit, overlap_limit):
     overlap_a = overlap_a[self_mask]
     overlap_b = overlap_b[self_mask]
 
-    source = gdf.index[np.concatenate([overlap_a, contains_a])]
-    target = gdf.index[np.concatenate([overlap_b, contains_b])]
+    source = np.concatenate([overlap_a, contains_a])
+    target = np.concatenate([overlap_b, contains_b])
 
-    neighbors = defaultdict(list)
-    for key, value in zip(source, target, strict=False):
-        neighbors[key].append(value)
+    # small polygons merge with all their neighbors, larger ones only with the
+    # neighbors sharing enough of the neighbor's area
+    geoms = context.geometry
+    area = shapely.area(geoms)
+    include = area[source] < merge_limit
+    large = np.flatnonzero(~include)
+    small, big = source[large], target[large]
+    with _stage("shares", geoms, small):
+        shared = shapely.area(shapely.intersection(geoms[big], geoms[small]))
+    include[large] = shared > area[big] * overlap_limit
 
-    neighbors_final = {}
+    with _stage("components"):
+        labels = _component_labels(len(gdf), source[include], target[include])
+    with _stage("dissolve", geoms):
+        return _dissolve(gdf, labels)
 
-    for i, poly in gdf.geometry.items():
-        if i in neighbors:
-            if poly.area < merge_limit:
-                neighbors_final[i] = neighbors[i]
-            else:
-                sub = gdf.geometry.loc[neighbors[i]]
-                inters = sub.intersection(poly)
-                include = sub.index[inters.area > (sub.area * overlap_limit)]
-                neighbors_final[i] = list(include)
-        else:
-            neighbors_final[i] = []
 
-    w = libpysal.graph.Graph.from_dicts(neighbors_final)
-    dissolved_gdf = gdf.dissolve(w.component_labels)
-    dissolved_gdf.index = w.component_labels.drop_duplicates().index
-    dissolved_gdf = dissolved_gdf.rename_axis(index=gdf.index.name)
-    return dissolved_gdf
-
-
-def merge_touching(gdf, index, largest=None):
+@_instrumented
+def merge_touching(gdf, index, largest=None, context=None):
     """Merge or remove polygons based on a set of conditions.
 
     If polygon does not share any boundary with another polygon, remove. If it shares
@@ -220,6 +366,8 @@ def merge_touching(gdf, index, largest=None):
         Merge with the polygon with the largest (True) or smallest (False) shared
         boundary. If None, merge with any neighbor non-deterministically but
         performantly.
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
 
     Returns
     -------
@@ -227,41 +375,109 @@ def merge_touching(gdf, index, largest=None):
     GeoDataFrame
     """
 
-    merge_gdf = gdf.loc[index]
+    context = _get_context(gdf, context)
+    merge = gdf.index.isin(gdf.loc[index].index)
 
-    if GPD_GE_014:
-        source, target = gdf.boundary.sindex.query(
-            merge_gdf.boundary, predicate="overlaps"
-        )
+    # only the boundaries of the polygons to merge are queried
+    candidates = np.flatnonzero(merge)
+    boundaries = context.boundary[candidates]
+    with _stage("query:overlaps", boundaries):
+        source, target = context.boundary_sindex.query(boundaries, predicate="overlaps")
+    source = candidates[source]
+
+    # pick one neighbor of each polygon to merge, the first one found or the one
+    # sharing the longest or shortest part of its exterior
+    if largest is None:
+        source, best = group_arg(np.zeros(len(source)), source)
     else:
-        source, target = gdf.boundary.sindex.query_bulk(
-            merge_gdf.boundary, predicate="overlaps"
+        geoms = context.geometry
+        rings = np.where(
+            shapely.get_type_id(geoms) == 3,
+            shapely.get_exterior_ring(geoms),
+            context.boundary,
         )
+        with _stage("shares", geoms, target):
+            shared = shapely.length(shapely.intersection(geoms[target], rings[source]))
+        source, best = group_arg(shared, source, largest=largest)
+    target = target[best]
 
-    source = merge_gdf.index[source]
-    target = gdf.index[target]
+    # polygons to merge without any neighbor are removed
+    keep = np.ones(len(gdf), dtype=bool)
+    keep[merge] = False
+    keep[source] = True
+    positions = np.cumsum(keep) - 1
 
-    neighbors = {}
-    delete = []
-    for i, poly in gdf.geometry.items():
-        if i in merge_gdf.index:
-            if i in source:
-                if largest is None:
-                    neighbors[i] = [target[source == i][0]]
-                else:
-                    sub = gdf.geometry.loc[target[source == i]]
-                    inters = sub.intersection(poly.exterior)
-                    if largest:
-                        neighbors[i] = [inters.length.idxmax()]
-                    else:
-                        neighbors[i] = [inters.length.idxmin()]
-            else:
-                delete.append(i)
-        else:
-            neighbors[i] = []
-
-    w = libpysal.graph.Graph.from_dicts(neighbors)
-    dissolved_gdf = gdf.drop(delete).dissolve(w.component_labels)
-    dissolved_gdf.index = w.component_labels.drop_duplicates().index
-    dissolved_gdf = dissolved_gdf.rename_axis(index=gdf.index.name)
-    return dissolved_gdf
+    with _stage("components"):
+        labels = _component_labels(keep.sum(), positions[source], positions[target])
+    with _stage("dissolve", context.geometry, keep):
+        return _dissolve(gdf[keep], labels)
+
+
+def _component_labels(n, focal, neighbor):
+    """Label the connected components of the graph of pairs of polygons
+
+    Parameters
+    ----------
+    n : int
+        number of polygons
+    focal, neighbor : np.ndarray
+        positions of the polygons of each edge
+
+    Returns
+    -------
+    np.ndarray
+        component label of each polygon
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    adjacency = coo_matrix(
+        (np.ones(len(focal), dtype=bool), (focal, neighbor)), shape=(n, n)
+    )
+    return connected_components(adjacency, directed=False)[1]
+
+
+def _dissolve(gdf, labels):
+    """Dissolve polygons by component labels
+
+    Equivalent of ``gdf.dissolve(labels)`` unioning all components in a single
+    vectorized pass. Components of a single polygon are kept as they are.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        GeoDataFrame with polygon or mutli polygon geometry
+    labels : np.ndarray
+        component label of each polygon
+
+    Returns
+    -------
+    GeoDataFrame
+        one row per component, in the order of their first polygon and indexed
+        by its label, with the first value of each attribute
+    """
+    geoms = np.asarray(gdf.geometry.values)
+    _, first, inverse, counts = np.unique(
+        labels, return_index=True, return_inverse=True, return_counts=True
+    )
+    # number the components in the order of their first polygon
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    labels, first, counts = rank[inverse.ravel()], first[order], counts[order]
+
+    geom_col = gdf.geometry.name
+    unions = geoms[first]
+    attributes = gdf.drop(columns=geom_col).iloc[first]
+    attributes.index = np.arange(len(first))
+    multi = counts[labels] > 1
+    if multi.any():
+        _, unions[counts > 1] = grouped_union(geoms[multi], labels[multi])
+        grouped = gdf.drop(columns=geom_col)[multi].groupby(labels[multi]).first()
+        attributes = pandas.concat([attributes[counts == 1], grouped]).sort_index()
+
+    dissolved = geopandas.GeoDataFrame(
+        {geom_col: unions}, geometry=geom_col, crs=gdf.crs
+    ).join(attributes)
+    dissolved.index = gdf.index[first]
+    return dissolved
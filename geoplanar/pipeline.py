@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Repair pipeline chaining the fixes of a polygon layer."""
+
+import operator
+
+import geopandas
+import numpy as np
+import shapely
+
+from .context import PlanarContext
+from .gap import fill_gaps, snap
+from .hole import add_interiors
+from .instrumentation import _instrumented, _stage
+from .overlap import trim_overlaps
+from .planar import fix_npe_edges, is_planar_enforced
+
+__all__ = ["repair"]
+
+STEPS = (
+    "add_interiors",
+    "trim_overlaps",
+    "fill_gaps",
+    "snap",
+    "fix_npe_edges",
+    "is_planar_enforced",
+)
+
+
+@_instrumented
+def repair(
+    gdf,
+    steps=(
+        "add_interiors",
+        "trim_overlaps",
+        "fill_gaps",
+        "fix_npe_edges",
+        "is_planar_enforced",
+    ),
+    strategy="largest",
+    threshold=None,
+    inplace=False,
+    n_jobs=1,
+):
+    """Apply a sequence of repairs to a polygon layer.
+
+    The steps run on the geometry column alone rather than on copies of the
+    whole layer. The geometries a step actually modifies, with coordinates that
+    differ from the previous ones, are the only ones written back, and they are
+    the only ones queried again to update the :class:`PlanarContext` shared by
+    the steps.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        GeoDataFrame with polygon or multipolygon geometries
+    steps : sequence of str
+        steps to apply, in order. Any of ``'add_interiors'``,
+        ``'trim_overlaps'``, ``'fill_gaps'``, ``'snap'``, ``'fix_npe_edges'``
+        and ``'is_planar_enforced'``, the latter testing the result without
+        modifying it.
+    strategy : {'smallest', 'largest', 'compact', None}, default 'largest'
+        strategy passed to :func:`trim_overlaps` and :func:`fill_gaps`
+    threshold : float, optional
+        threshold passed to :func:`snap`, required by the ``'snap'`` step
+    inplace : bool, default False
+        If True, modify the input GeoDataFrame in place.
+    n_jobs : int, default 1
+        Number of threads used by :func:`trim_overlaps`. -1 uses all available
+        cores.
+
+    Returns
+    -------
+    gdf : GeoDataFrame
+        repaired layer
+    summary : dict
+        number of geometries modified by each step, and whether the result is
+        planar enforced for ``'is_planar_enforced'``
+
+    Examples
+    --------
+    >>> repaired, summary = geoplanar.repair(gdf)
+    >>> summary
+    {'add_interiors': 1, 'trim_overlaps': 2, 'fill_gaps': 1, 'fix_npe_edges': 0,
+     'is_planar_enforced': True}
+    """
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown repair steps: {sorted(unknown)}")
+    if "snap" in steps and threshold is None:
+        raise ValueError("The 'snap' step requires a threshold.")
+
+    if not inplace:
+        gdf = gdf.copy()
+    geom_col_idx = gdf.columns.get_loc(gdf.geometry.name)
+
+    # the steps run on the geometry column alone
+    layer = geopandas.GeoDataFrame(
+        geometry=geopandas.GeoSeries(gdf.geometry.values, index=gdf.index),
+        crs=gdf.crs,
+    )
+    modified = np.zeros(len(gdf), dtype=bool)
+    summary = {}
+    context = PlanarContext(layer)
+    for step in steps:
+        if step == "is_planar_enforced":
+            summary[step] = is_planar_enforced(layer, context=context)
+            continue
+
+        if step == "add_interiors":
+            result = add_interiors(layer, context=context)
+        elif step == "trim_overlaps":
+            result = trim_overlaps(
+                layer, strategy=strategy, n_jobs=n_jobs, context=context
+            )
+        elif step == "fill_gaps":
+            result = fill_gaps(layer, strategy=strategy, context=context)
+        elif step == "snap":
+            result = snap(layer, threshold, context=context)
+        else:
+            result = fix_npe_edges(layer, context=context)
+
+        before = context.geometry
+        after = np.asarray(result.geometry.values)
+        # rewritten geometries with the same coordinates are left untouched
+        changed = np.flatnonzero(
+            np.fromiter(map(operator.is_not, before, after), dtype=bool)
+        )
+        with _stage("compare", after, changed):
+            changed = changed[
+                ~shapely.equals_exact(before[changed], after[changed], tolerance=0)
+            ]
+        summary[step] = len(changed)
+        if len(changed):
+            with _stage("write", after, changed):
+                layer.iloc[changed, 0] = after[changed]
+            context.update(layer, changed)
+            modified[changed] = True
+
+    if modified.any():
+        with _stage("write", layer.geometry.values, modified):
+            gdf.iloc[np.flatnonzero(modified), geom_col_idx] = layer.geometry.values[
+                modified
+            ]
+    return gdf, summary
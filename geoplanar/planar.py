@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import geopandas
 import numpy
 import pandas
-from libpysal.graph import Graph
+import shapely
+from packaging.version import Version
 from shapely import (
     GeometryCollection,
     LineString,
@@ -12,11 +17,15 @@ from shapely import (
     Point,
     Polygon,
 )
-from shapely.ops import linemerge, polygonize, split
+from shapely.ops import linemerge, split
 
-from .gap import gaps
+from ._kernels import group_arg, grouped_union, isoperimetric_quotient, map_chunks
+from .context import _PATTERNS, PlanarContext, _de9im, _get_context, _matches
+from .gap import _gaps_near, gaps
 from .hole import missing_interiors
+from .instrumentation import _instrumented, _stage
 from .overlap import is_overlapping, overlaps
+from .valid import isvalid
 
 __all__ = [
     "non_planar_edges",
@@ -26,17 +35,27 @@ __all__ = [
     "insert_intersections",
     "self_intersecting_rings",
     "check_validity",
+    "update_validity",
 ]
 
+SHAPELY_GE_21 = Version(shapely.__version__) >= Version("2.1.0")
+
 
-def non_planar_edges(gdf):
+@_instrumented
+def non_planar_edges(gdf, context=None):
     """Find coincident nonplanar edges
 
+    Two polygons have a nonplanar edge if they intersect without sharing a
+    vertex.
+
     Parameters
     ----------
 
     gdf :  GeoDataFrame with polygon (multipolygon) GeoSeries
 
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
 
     Returns
     -------
@@ -58,18 +77,252 @@ def non_planar_edges(gdf):
     Name: weight, dtype: int64
 
     """
-    vertex_queen = Graph.build_contiguity(gdf, rook=False, strict=False)
-    strict_queen = Graph.build_fuzzy_contiguity(gdf)
-    return strict_queen.difference(vertex_queen)
+    i, j = _non_planar_pairs(_get_context(gdf, context))
+    return _pairs_graph(gdf.index, i, j)
+
+
+def _pairs_graph(index, i, j):
+    """Build the graph of pairs of polygons
+
+    Parameters
+    ----------
+    index : pandas.Index
+        index of the polygons
+    i, j : numpy.ndarray
+        positions of the polygons of each pair, in both directions
+
+    Returns
+    -------
+    libpysal.graph.Graph
+    """
+    # libpysal is slow to import and only needed here
+    from libpysal.graph import Graph
+
+    # isolates are encoded as self-loops with zero weight
+    focal, neighbor, weight = i, j, numpy.ones(len(i), dtype=numpy.int8)
+    isolates = numpy.setdiff1d(numpy.arange(len(index)), i)
+    if len(isolates):
+        focal = numpy.concatenate([focal, isolates])
+        neighbor = numpy.concatenate([neighbor, isolates])
+        weight = numpy.concatenate([weight, numpy.zeros(len(isolates), dtype=int)])
+    order = numpy.lexsort((neighbor, focal))
+    adjacency = pandas.Series(
+        weight[order],
+        index=pandas.MultiIndex.from_arrays(
+            [index[focal[order]], index[neighbor[order]]],
+            names=["focal", "neighbor"],
+        ),
+        name="weight",
+    )
+    return Graph(adjacency)
+
+
+def _non_planar_pairs(context):
+    """Find the pairs of polygons intersecting without sharing a vertex
+
+    Vertices are matched on their exact coordinates.
+
+    Parameters
+    ----------
+    context : PlanarContext
+        context of the layer
+
+    Returns
+    -------
+    i, j : numpy.ndarray
+        positions of the polygons of each pair, in both directions
+    """
+    i, j = context.query("intersects")
+    mask = i != j
+    i, j = i[mask], j[mask]
+    mask = ~_share_vertex(context.geometry, i, j)
+    return i[mask], j[mask]
 
 
-def planar_enforce(gdf):
-    uu = gdf.unary_union
-    geoms = [uu.intersection(row.geometry) for index, row in gdf.iterrows()]
-    return geopandas.GeoDataFrame(geometry=geoms)
+def _share_vertex(geoms, i, j):
+    """Test whether the polygons of each pair share a vertex
 
+    Vertices are matched on their exact coordinates.
 
-def is_planar_enforced(gdf, allow_gaps=False):
+    Parameters
+    ----------
+    geoms : numpy.ndarray
+        array of polygons
+    i, j : numpy.ndarray
+        positions of the polygons of each pair
+
+    Returns
+    -------
+    numpy.ndarray
+        boolean mask of the pairs sharing a vertex
+    """
+    n = len(geoms)
+    # hash the vertices and find the pairs of polygons sharing any of them
+    with _stage("vertices", geoms):
+        coords, owner = shapely.get_coordinates(geoms, return_index=True)
+        vertex = numpy.unique(coords, axis=0, return_inverse=True)[1].ravel()
+        vertex, owner = numpy.unique(numpy.c_[vertex, owner], axis=0).T
+        shared = []
+        offset = 1
+        while offset < len(vertex):
+            same = vertex[offset:] == vertex[:-offset]
+            if not same.any():
+                break
+            a, b = owner[:-offset][same], owner[offset:][same]
+            shared.extend([a * n + b, b * n + a])
+            offset += 1
+    return numpy.isin(i * n + j, numpy.concatenate(shared) if shared else [])
+
+
+@_instrumented
+def planar_enforce(gdf, strategy="largest", fill_gaps=False, context=None):
+    """Enforce planarity by assigning each face of the layer to a single polygon
+
+    The boundaries of all polygons are noded and polygonized once. Every face
+    covered by one or more polygons is assigned to one of them, which resolves
+    the overlaps, and each polygon is rebuilt as the union of its faces. Optionally,
+    the faces not covered by any polygon (gaps) are assigned to one of the
+    polygons they touch.
+
+    As in :func:`trim_overlaps`, the strategy selects the polygons trimmed from a
+    shared face, and as in :func:`fill_gaps`, the polygon receiving a gap.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        GeoDataFrame with polygon or multipolygon geometries
+
+    strategy : {'largest', 'smallest', 'first', 'compact'}, default 'largest'
+        Strategy to resolve faces shared by several polygons and, if
+        ``fill_gaps=True``, gaps touching several polygons:
+          - 'largest' : trim the larger polygons, so the smallest one keeps a
+                        shared face; merge a gap with the largest polygon.
+          - 'smallest': trim the smaller polygons, so the largest one keeps a
+                        shared face; merge a gap with the smallest polygon.
+          - 'first'   : the polygon that comes first in ``gdf`` keeps a shared
+                        face or receives a gap.
+          - 'compact' : trim the polygons yielding the most compact trimmed
+                        polygons (isoperimetric quotient); merge a gap with the
+                        polygon yielding the most compact merged polygon.
+
+        The input polygons are compared, so unlike the pairwise
+        :func:`trim_overlaps`, the result does not depend on the order in which
+        the overlaps are resolved. Ties are resolved in favour of the polygon that
+        comes first in ``gdf``.
+
+    fill_gaps : bool, default False
+        If True, also merge the gaps into the neighboring polygons.
+
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
+    Returns
+    -------
+    GeoDataFrame
+        copy of ``gdf`` with the geometries replaced. Polygons entirely covered by
+        others that received all their faces are returned empty.
+    """
+    if strategy not in ("largest", "smallest", "first", "compact"):
+        raise ValueError(
+            "strategy must be one of 'largest', 'smallest', 'first' or 'compact', "
+            f"got {strategy!r}"
+        )
+    context = _get_context(gdf, context)
+    geoms = context.geometry
+
+    with _stage("polygonize", context.boundary):
+        faces = shapely.get_parts(
+            shapely.polygonize([shapely.union_all(context.boundary)])
+        )
+    with _stage("query:within", faces):
+        face_idx, poly_idx = context.sindex.query(
+            shapely.point_on_surface(faces), predicate="within"
+        )
+    with _stage("owners", faces, face_idx):
+        face_idx, owner = _face_owners(faces, geoms, face_idx, poly_idx, strategy)
+
+    if fill_gaps:
+        gap = numpy.setdiff1d(numpy.arange(len(faces)), face_idx)
+        gap_faces = faces[gap]
+        with _stage("gaps", gap_faces):
+            gap_idx, poly_idx = context.sindex.query(gap_faces, predicate="intersects")
+            gap_idx, gap_owner = _face_owners(
+                faces, geoms, gap[gap_idx], poly_idx, strategy, gaps=True
+            )
+        face_idx = numpy.concatenate([face_idx, gap_idx])
+        owner = numpy.concatenate([owner, gap_owner])
+
+    # faces are a coverage; polygons that kept no face end up empty
+    with _stage("union", faces, face_idx):
+        positions, merged = grouped_union(faces[face_idx], owner, coverage=True)
+    new_geoms = numpy.empty(len(gdf), dtype=object)
+    new_geoms[:] = Polygon()
+    new_geoms[positions] = merged
+
+    gdf = gdf.copy()
+    gdf[gdf.geometry.name] = geopandas.GeoSeries(
+        new_geoms, index=gdf.index, crs=gdf.crs
+    )
+    return gdf
+
+
+def _face_owners(faces, geoms, face_idx, poly_idx, strategy, gaps=False):
+    """Pick one polygon for each face among its candidates
+
+    Parameters
+    ----------
+    faces : numpy.ndarray
+        faces of the layer
+    geoms : numpy.ndarray
+        polygons of the layer
+    face_idx, poly_idx : numpy.ndarray
+        candidate (face, polygon) pairs
+    strategy : {'largest', 'smallest', 'first', 'compact'}
+        see :func:`planar_enforce`
+    gaps : bool, default False
+        whether the faces are gaps touching the candidates rather than faces
+        covered by them
+
+    Returns
+    -------
+    face_idx, owner : numpy.ndarray
+        each face with a candidate and the position of its owner
+    """
+    # the candidates of each face form a contiguous block ordered by position
+    order = numpy.lexsort((poly_idx, face_idx))
+    face_idx, poly_idx = face_idx[order], poly_idx[order]
+
+    if strategy == "first":
+        face_idx, best = numpy.unique(face_idx, return_index=True)
+        return face_idx, poly_idx[best]
+    if strategy == "compact":
+        if gaps:
+            # merging the gap with the candidate
+            values = isoperimetric_quotient(
+                shapely.union(geoms[poly_idx], faces[face_idx])
+            )
+            largest = True
+        else:
+            # trimming the face from the candidate, only for shared faces; the
+            # least compact result keeps the face and a candidate that would be
+            # trimmed away entirely always does
+            values = numpy.zeros(len(face_idx))
+            shared = numpy.bincount(face_idx)[face_idx] > 1
+            values[shared] = isoperimetric_quotient(
+                shapely.difference(geoms[poly_idx[shared]], faces[face_idx[shared]])
+            )
+            values = numpy.nan_to_num(values, nan=-numpy.inf)
+            largest = False
+    else:
+        values = shapely.area(geoms[poly_idx])
+        # gaps go to the selected polygon, shared faces are trimmed from it
+        largest = (strategy == "largest") == gaps
+    face_idx, best = group_arg(values, face_idx, largest=largest)
+    return face_idx, poly_idx[best]
+
+
+@_instrumented
+def is_planar_enforced(gdf, allow_gaps=False, context=None):
     """Test if a geodataframe has any planar enforcement violations
 
     Parameters
@@ -77,24 +330,28 @@ def is_planar_enforced(gdf, allow_gaps=False):
     gdf: GeoDataFrame with polygon geoseries for geometry
     allow_gaps: boolean
         If True, allow gaps in the polygonal coverage
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
 
     Returns
     -------
     boolean
     """
+    context = _get_context(gdf, context)
 
-    if is_overlapping(gdf):
+    if is_overlapping(gdf, context=context):
         return False
-    if non_planar_edges(gdf):
+    if len(_non_planar_pairs(context)[0]):
         return False
     if not allow_gaps:
-        _gaps = gaps(gdf)
+        _gaps = gaps(gdf, context=context)
         if _gaps.shape[0] > 0:
             return False
     return True
 
 
-def fix_npe_edges(gdf, inplace=False):
+@_instrumented
+def fix_npe_edges(gdf, inplace=False, method="pairwise", context=None):
     """Fix all npe intersecting edges in geoseries.
 
     Arguments
@@ -102,6 +359,19 @@ def fix_npe_edges(gdf, inplace=False):
 
     gdf: GeoDataFrame with polygon geoseries for geometry
 
+    inplace : bool, default False
+        If True, modify the input GeoDataFrame in place.
+
+    method : {'pairwise', 'global'}, default 'pairwise'
+        - 'pairwise': correct the pairs one by one with
+          :func:`insert_intersections`.
+        - 'global'  : compute the intersections of all pairs at once and insert
+          all of them into the rings of each polygon in a single pass, so that each
+          polygon is rebuilt only once.
+
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
 
     Returns
     -------
@@ -123,25 +393,124 @@ def fix_npe_edges(gdf, inplace=False):
 
 
     """
+    if method not in ("pairwise", "global"):
+        raise ValueError(f"method must be 'pairwise' or 'global', got {method!r}")
+
+    i, j = _non_planar_pairs(_get_context(gdf, context))
+    mask = i < j
+    order = numpy.lexsort((j[mask], i[mask]))
+    i, j = i[mask][order], j[mask][order]
+
     if not inplace:
         gdf = gdf.copy()
-
-    edges = non_planar_edges(gdf)
-    unique_edges = edges.adjacency[
-        ~pandas.DataFrame(numpy.sort(edges.adjacency.index.to_frame(), axis=1))
-        .duplicated()
-        .values
-    ].index
-    for i, j in unique_edges:
-        poly_a = gdf.geometry.loc[i]
-        poly_b = gdf.geometry.loc[j]
-        new_a, new_b = insert_intersections(poly_a, poly_b)
-        poly_a = new_a
-        gdf.loc[i, gdf.geometry.name] = new_a
-        gdf.loc[j, gdf.geometry.name] = new_b
+    geom_col_idx = gdf.columns.get_loc(gdf.geometry.name)
+
+    if method == "global":
+        if len(i) == 0:
+            return gdf
+        geoms = numpy.asarray(gdf.geometry.values)
+        with _stage("insert", lambda: geoms[numpy.union1d(i, j)]):
+            changed, new_geoms = _insert_all_intersections(geoms, i, j)
+        with _stage("write", new_geoms):
+            gdf.iloc[changed, geom_col_idx] = new_geoms
+        return gdf
+
+    with _stage("insert"):
+        for a, b in zip(i, j, strict=True):
+            new_a, new_b = insert_intersections(
+                gdf.geometry.iloc[a], gdf.geometry.iloc[b]
+            )
+            gdf.iloc[a, geom_col_idx] = new_a
+            gdf.iloc[b, geom_col_idx] = new_b
     return gdf
 
 
+def _insert_all_intersections(geoms, i, j):
+    """Insert the boundary intersections of all pairs into the polygon rings
+
+    Each intersection point is inserted into the nearest ring of both polygons
+    of its pair, after the vertex preceding it along the ring. Points that are
+    already vertices of the ring are skipped.
+
+    Parameters
+    ----------
+    geoms : numpy.ndarray
+        polygons of the layer
+    i, j : numpy.ndarray
+        positions of the pairs to correct
+
+    Returns
+    -------
+    changed : numpy.ndarray
+        positions of the rebuilt polygons
+    new_geoms : numpy.ndarray
+        rebuilt polygons
+    """
+    if shapely.relate_pattern(geoms[i], geoms[j], "T********").any():
+        raise ValueError(
+            "Polygons are overlapping. Fix overlaps before fixing nonplanar edges."
+        )
+
+    # collect the points to insert into each polygon
+    boundary = shapely.boundary(geoms)
+    points, pair = shapely.get_coordinates(
+        shapely.intersection(boundary[i], boundary[j]), return_index=True
+    )
+    points = numpy.concatenate([points, points])
+    owner = numpy.concatenate([i[pair], j[pair]])
+    changed, owner = numpy.unique(owner, return_inverse=True)
+
+    # explode the polygons into rings
+    parts, part_owner = shapely.get_parts(geoms[changed], return_index=True)
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    ring_owner = part_owner[ring_part]
+
+    # match each point with the nearest ring of its polygon
+    ring_start = numpy.searchsorted(ring_owner, numpy.arange(len(changed)))
+    n_rings = numpy.bincount(ring_owner, minlength=len(changed))
+    point_index = numpy.repeat(numpy.arange(len(points)), n_rings[owner])
+    candidate = numpy.repeat(ring_start[owner], n_rings[owner]) + (
+        numpy.arange(len(point_index))
+        - numpy.repeat(numpy.cumsum(n_rings[owner]) - n_rings[owner], n_rings[owner])
+    )
+    distance = shapely.distance(rings[candidate], shapely.points(points[point_index]))
+    nearest = candidate[group_arg(distance, point_index, largest=False)[1]]
+
+    # order the vertices and the points along each ring by the distance from its
+    # start; the closing vertex comes last
+    coords, vertex_ring = shapely.get_coordinates(rings, return_index=True)
+    step = numpy.r_[0, numpy.hypot(*numpy.diff(coords, axis=0).T)]
+    step[numpy.r_[True, vertex_ring[1:] != vertex_ring[:-1]]] = 0
+    along = numpy.cumsum(step)
+    along -= along[numpy.searchsorted(vertex_ring, vertex_ring)]
+    closing = numpy.r_[vertex_ring[1:] != vertex_ring[:-1], True]
+    unique = numpy.unique(numpy.c_[nearest, points], axis=0)
+    nearest, points = unique[:, 0].astype(numpy.intp), unique[:, 1:]
+    point_along = shapely.line_locate_point(rings[nearest], shapely.points(points))
+
+    all_coords = numpy.concatenate([coords, points])
+    all_ring = numpy.concatenate([vertex_ring, nearest])
+    kind = numpy.concatenate([numpy.where(closing, 2, 0), numpy.ones(len(points))])
+    order = numpy.lexsort((kind, numpy.concatenate([along, point_along]), all_ring))
+    all_coords, all_ring, kind = all_coords[order], all_ring[order], kind[order]
+
+    # skip inserted points equal to an adjacent vertex
+    same = (all_ring[1:] == all_ring[:-1]) & (all_coords[1:] == all_coords[:-1]).all(1)
+    same_prev = numpy.r_[False, same]
+    same_next = numpy.r_[same & (kind[1:] != 1), False]
+    keep = (kind != 1) | ~(same_prev | same_next)
+    all_coords, all_ring = all_coords[keep], all_ring[keep]
+
+    # rebuild each polygon once
+    rings = shapely.linearrings(all_coords, indices=all_ring)
+    parts = shapely.polygons(rings, indices=ring_part)
+    multi = shapely.get_type_id(geoms[changed]) == 6
+    new_geoms = shapely.multipolygons(parts, indices=part_owner)
+    new_geoms[~multi] = shapely.get_geometry(new_geoms[~multi], 0)
+    return changed, new_geoms
+
+
+@_instrumented
 def insert_intersections(poly_a, poly_b):
     """Correct two npe intersecting polygons by inserting intersection points
     on intersecting edges
@@ -165,8 +534,7 @@ def insert_intersections(poly_a, poly_b):
                     exterior = LineString(list(part.exterior.coords))
                     splits = split(exterior, pint).geoms
                     if len(splits) > 1:
-                        left, right = splits
-                        exterior = linemerge([left, right])
+                        exterior = linemerge(list(splits))
                         part = Polygon(exterior)
                     new_parts.append(part)
                 new_poly = MultiPolygon(new_parts)
@@ -175,8 +543,7 @@ def insert_intersections(poly_a, poly_b):
                 exterior = LineString(list(poly.exterior.coords))
                 splits = split(exterior, pint).geoms
                 if len(splits) > 1:
-                    left, right = splits
-                    exterior = linemerge([left, right])
+                    exterior = linemerge(list(splits))
                     new_poly = Polygon(exterior)
                     new_polys.append(Polygon(new_poly))
                 else:
@@ -186,35 +553,251 @@ def insert_intersections(poly_a, poly_b):
         raise ValueError(overlapping_msg)
 
 
+@_instrumented
 def self_intersecting_rings(gdf):
-    sirs = []
-    for i, geom in enumerate(gdf.geometry):
-        if not geom.is_valid:
-            sirs.append(i)
-    return sirs
+    return numpy.flatnonzero(~shapely.is_valid(gdf.geometry.values)).tolist()
 
 
 def fix_self_intersecting_ring(polygon):
-    p0 = polygon.exterior
-    mls = p0.intersection(p0)
-    polys = polygonize(mls)
-    return MultiPolygon(polys)
+    return _make_valid(numpy.array([polygon]))[0]
 
 
-def check_validity(gdf):
+def _make_valid(geoms, n_jobs=1):
+    """Repair invalid polygons, keeping their holes
+
+    Parameters
+    ----------
+    geoms : numpy.ndarray
+        invalid polygons
+    n_jobs : int, default 1
+        Number of threads used for the repair. -1 uses all available cores.
+
+    Returns
+    -------
+    numpy.ndarray
+        valid polygons or multipolygons
+    """
+    if SHAPELY_GE_21:
+        repair = partial(shapely.make_valid, method="structure", keep_collapsed=False)
+    else:
+        repair = shapely.make_valid
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    executor = ThreadPoolExecutor(n_jobs) if n_jobs > 1 else None
+    try:
+        fixed = map_chunks(repair, geoms, n_jobs=n_jobs, executor=executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # the linework method may return collapsed parts as lines and points
+    collection = numpy.flatnonzero(shapely.get_type_id(fixed) == 7)
+    if len(collection):
+        parts, index = shapely.get_parts(fixed[collection], return_index=True)
+        polygonal = numpy.isin(shapely.get_type_id(parts), [3, 6])
+        polygons, sub_index = shapely.get_parts(parts[polygonal], return_index=True)
+        out = numpy.empty(len(collection), dtype=object)
+        out[:] = MultiPolygon()
+        fixed[collection] = shapely.multipolygons(
+            polygons, indices=index[polygonal][sub_index], out=out
+        )
+    return fixed
+
+
+@_instrumented
+def check_validity(gdf, n_jobs=1, context=None):
+    """Check a GeoDataFrame for planar enforcement violations
+
+    Invalid geometries are repaired with :func:`shapely.make_valid` before the
+    other checks.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        GeoDataFrame with polygon or multipolygon geometries
+    n_jobs : int, default 1
+        Number of threads used to repair invalid geometries. -1 uses all
+        available cores.
+    context : PlanarContext, optional
+        spatial indexes and cached queries of ``gdf``, built if not given
+
+    Returns
+    -------
+    dict
+        violations by type; ``"invalidreasons"`` holds the reason each geometry in
+        ``"selfintersectingrings"`` is invalid
+    """
     gdfv = gdf.copy()
-    sirs = self_intersecting_rings(gdf)
+    geoms = numpy.asarray(gdf.geometry.values)
+    with _stage("validity", geoms):
+        invalid = ~shapely.is_valid(geoms)
+        sirs = numpy.flatnonzero(invalid).tolist()
+        reasons = isvalid(geoms[invalid]).tolist()
     if sirs:
-        for i in self_intersecting_rings(gdf):
-            fixed_i = fix_self_intersecting_ring(gdfv.geometry.iloc[i])
-            gdfv.geometry.iloc[i] = fixed_i
-
-    _gaps = gaps(gdfv)
-    _overlaps = overlaps(gdfv)
+        geoms = geoms.copy()
+        with _stage("repair", geoms, invalid):
+            geoms[invalid] = _make_valid(geoms[invalid], n_jobs=n_jobs)
+        gdfv[gdfv.geometry.name] = geopandas.GeoSeries(
+            geoms, index=gdfv.index, crs=gdfv.crs
+        )
+        # the geometries were fixed, the context of the input does not apply
+        context = None
+    context = _get_context(gdfv, context)
+    # classify all intersecting pairs at once for the overlap and containment
+    # checks below
+    context.relate()
+
+    _gaps = gaps(gdfv, context=context)
+    _overlaps = overlaps(gdfv, context=context)
     violations = {}
     violations["selfintersectingrings"] = sirs
+    violations["invalidreasons"] = reasons
     violations["gaps"] = _gaps
     violations["overlaps"] = _overlaps
-    violations["nonplanaredges"] = non_planar_edges(gdfv)
-    violations["missinginteriors"] = missing_interiors(gdfv)
+    violations["nonplanaredges"] = non_planar_edges(gdfv, context=context)
+    violations["missinginteriors"] = missing_interiors(gdfv, context=context)
+    return violations
+
+
+@_instrumented
+def update_validity(gdf, previous, report, changed=(), n_jobs=1):
+    """Update a validity report after some features of a layer were edited
+
+    Only the neighborhood of the modified, added and removed features is checked
+    again, so that the cost of an update depends on the size of the edit rather
+    than on the size of the layer.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        edited layer
+    previous : GeoDataFrame
+        layer before the edit
+    report : dict
+        report of :func:`check_validity` or of a previous update for
+        ``previous``
+    changed : array_like, optional
+        index labels of the modified features; added and removed features are
+        found from the index of ``gdf``
+    n_jobs : int, default 1
+        Number of threads used to repair invalid geometries. -1 uses all
+        available cores.
+
+    Returns
+    -------
+    dict
+        violations by type, as returned by :func:`check_validity` for ``gdf``
+
+    Examples
+    --------
+    >>> report = geoplanar.check_validity(gdf)
+    >>> edited = gdf.copy()
+    >>> edited.loc[3, "geometry"] = box(0, 0, 1, 1)
+    >>> report = geoplanar.update_validity(edited, gdf, report, changed=[3])
+    """
+    index = gdf.index
+    old = previous.index.get_indexer(index)
+    dirty = (old < 0) | index.isin(changed)
+    # features of the previous layer that were modified or removed
+    stale = previous.index.isin(changed) | ~previous.index.isin(index)
+    # position in the edited layer of each unchanged feature of the previous one
+    moved = numpy.full(len(previous), -1)
+    moved[old[~dirty]] = numpy.flatnonzero(~dirty)
+
+    # unchanged features keep their geometry, repaired again if it was invalid
+    previous_geoms = numpy.asarray(previous.geometry.values)
+    geoms = numpy.empty(len(gdf), dtype=object)
+    geoms[~dirty] = previous_geoms[old[~dirty]]
+    repaired = numpy.asarray(report["selfintersectingrings"], dtype=numpy.intp)
+    repaired = repaired[moved[repaired] >= 0]
+    if len(repaired):
+        with _stage("repair", previous_geoms, repaired):
+            geoms[moved[repaired]] = _make_valid(
+                previous_geoms[repaired], n_jobs=n_jobs
+            )
+    edited = numpy.asarray(gdf.geometry.values)[dirty]
+    with _stage("validity", edited):
+        invalid = ~shapely.is_valid(edited)
+        reasons = isvalid(edited[invalid]).tolist()
+    if invalid.any():
+        edited = edited.copy()
+        with _stage("repair", edited, invalid):
+            edited[invalid] = _make_valid(edited[invalid], n_jobs=n_jobs)
+    geoms[dirty] = edited
+    context = PlanarContext(geopandas.GeoSeries(geoms, index=index, crs=gdf.crs))
+
+    sirs = moved[report["selfintersectingrings"]]
+    kept = sirs >= 0
+    sirs = numpy.concatenate([sirs[kept], numpy.flatnonzero(dirty)[invalid]])
+    reasons = numpy.concatenate(
+        [numpy.asarray(report["invalidreasons"], dtype=object)[kept], reasons]
+    )
+    order = numpy.argsort(sirs, kind="stable")
+
+    with _stage("pairs", edited):
+        dirty_pos = numpy.flatnonzero(dirty)
+        a, b = context.sindex.query(edited, predicate="intersects")
+        a = dirty_pos[a]
+        n = len(geoms)
+        keys = numpy.unique(numpy.concatenate([a * n + b, b * n + a]))
+        i, j = numpy.divmod(keys, n)
+    with _stage("relate", geoms, i):
+        matrices = _de9im(geoms[i], geoms[j])
+    distinct = i != j
+    involved, local = numpy.unique(
+        numpy.concatenate([i, j])[numpy.r_[distinct, distinct]], return_inverse=True
+    )
+    li, lj = local.reshape(2, -1)
+    nonplanar = distinct.copy()
+    nonplanar[distinct] = ~_share_vertex(geoms[involved], li, lj)
+
+    def _merge(carried, mask):
+        # pairs of unchanged features are kept, pairs with an edited one replaced
+        carried = moved[numpy.asarray(carried, dtype=numpy.intp).reshape(2, -1)]
+        carried = carried[:, (carried >= 0).all(axis=0)]
+        pairs = numpy.concatenate([carried, numpy.stack([i[mask], j[mask]])], axis=1)
+        return pairs[:, numpy.lexsort(pairs[::-1])]
+
+    _overlaps = _merge(report["overlaps"], _matches(matrices, _PATTERNS["overlaps"]))
+    interiors = _merge(
+        report["missinginteriors"],
+        _matches(matrices, _PATTERNS["contains"]) & distinct,
+    )
+    adjacency = report["nonplanaredges"].adjacency
+    adjacency = adjacency[adjacency.to_numpy() > 0].index
+    edges = _merge(
+        [
+            previous.index.get_indexer(adjacency.get_level_values(level))
+            for level in ["focal", "neighbor"]
+        ],
+        nonplanar,
+    )
+
+    # gaps bounded by an edited feature, before or after the edit, are found again
+    with _stage("gaps", edited):
+        boxes = numpy.concatenate(
+            [
+                shapely.bounds(previous_geoms[stale]).reshape(-1, 4),
+                shapely.bounds(edited).reshape(-1, 4),
+            ]
+        )
+        _gaps = numpy.asarray(report["gaps"].values)
+        _, hit = shapely.STRtree(_gaps).query(
+            shapely.box(*boxes.T), predicate="intersects"
+        )
+        _gaps = numpy.concatenate(
+            [
+                numpy.delete(_gaps, hit),
+                _gaps_near(geoms, context.sindex, boxes, shapely.total_bounds(geoms)),
+            ]
+        )
+
+    violations = {}
+    violations["selfintersectingrings"] = sirs[order].tolist()
+    violations["invalidreasons"] = reasons[order].tolist()
+    violations["gaps"] = geopandas.GeoSeries(_gaps, crs=gdf.crs)
+    violations["overlaps"] = _overlaps
+    violations["nonplanaredges"] = _pairs_graph(index, *edges)
+    violations["missinginteriors"] = interiors
     return violations
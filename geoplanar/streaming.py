@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""Out-of-core planarity checks and repairs of file-backed layers."""
+
+import json
+
+import geopandas
+import numpy as np
+import pandas as pd
+import shapely
+
+from .context import PlanarContext
+from .gap import _tile_grid, _tile_of, _window_gaps, fill_gaps
+from .hole import add_interiors, missing_interiors
+from .instrumentation import _instrumented, _stage
+from .overlap import overlaps, trim_overlaps
+from .planar import _non_planar_pairs
+
+__all__ = ["check_file", "repair_file"]
+
+VIOLATION_TYPES = ["invalid", "overlap", "missinginterior", "nonplanaredge", "gap"]
+VIOLATION_COLUMNS = ["violation", "id_a", "id_b"]
+
+
+@_instrumented
+def check_file(path, violations, layer=None, tiles=10, halo=None, id_column=None):
+    """Check a file-backed layer for planar enforcement violations chunk by chunk.
+
+    The extent of the layer is split into a grid of tiles and only the features
+    around one tile are held in memory at a time. Each feature belongs to the
+    tile containing the centre of its bounding box and each violation is written
+    once, as soon as its tile has been processed.
+
+    Parameters
+    ----------
+    path : str
+        path to a file readable by pyogrio (e.g. GeoPackage) or a GeoParquet file
+        with a bounding box covering column (see ``write_covering_bbox`` in
+        :meth:`geopandas.GeoDataFrame.to_parquet`)
+    violations : str
+        path of the file the violations are written to, in any format pyogrio can
+        append to (e.g. GeoPackage). Each violation is a feature with the columns
+        ``violation`` (one of ``'invalid'``, ``'overlap'``, ``'missinginterior'``,
+        ``'nonplanaredge'`` or ``'gap'``), ``id_a`` and ``id_b`` (the ids of the
+        features involved, if any) and the geometry of the violation.
+    layer : str, optional
+        layer to read from ``path``
+    tiles : int | tuple(int, int), default 10
+        number of tiles along each axis
+    halo : float, optional
+        width of the margin read around each tile. Defaults to 10% of the tile
+        size. The margin grows automatically where gaps require it.
+    id_column : str, optional
+        column holding a unique feature id. Defaults to the feature id (FID) of
+        files read by pyogrio and is required for GeoParquet.
+
+    Returns
+    -------
+    dict
+        number of violations of each type
+    """
+    writer = _Writer()
+    counts = dict.fromkeys(VIOLATION_TYPES, 0)
+    for chunk in _chunks(path, layer, tiles, halo, id_column):
+        with _stage("detect", chunk.gdf.geometry.values):
+            found = _violations(chunk)
+        for name, n in found["violation"].value_counts().items():
+            counts[name] += n
+        with _stage("write", found.geometry.values):
+            writer.write(found, violations)
+    return counts
+
+
+@_instrumented
+def repair_file(
+    path,
+    output,
+    violations=None,
+    layer=None,
+    steps=("add_interiors", "trim_overlaps", "fill_gaps"),
+    strategy="largest",
+    tiles=10,
+    halo=None,
+    id_column=None,
+):
+    """Repair a file-backed layer chunk by chunk.
+
+    The features around each tile are read, repaired with the functions listed
+    in ``steps`` and the features belonging to the tile are written to
+    ``output``. Features are processed in the order of their ids, so that a pair
+    spanning two tiles is resolved the same way on both sides, and the area read
+    around a tile grows until the repair of its features does not depend on
+    features outside of it. The result matches the in-memory repair of the layer
+    sorted by id, up to the rounding of the intersections of the boundaries,
+    which depends on the features read.
+
+    Parameters
+    ----------
+    path : str
+        path to a file readable by pyogrio (e.g. GeoPackage) or a GeoParquet file
+        with a bounding box covering column
+    output : str
+        path of the repaired layer, in any format pyogrio can append to. The ids
+        of the features are written to the ``id_column`` column, or to a
+        ``source_fid`` column if the FIDs of ``path`` were used.
+    violations : str, optional
+        if given, the violations found before the repair are written to this file
+        as in :func:`check_file`
+    layer : str, optional
+        layer to read from ``path``
+    steps : sequence of str
+        repairs to apply, in order. Any of ``'add_interiors'``,
+        ``'trim_overlaps'`` and ``'fill_gaps'``.
+    strategy : {'smallest', 'largest', 'compact', None}, default 'largest'
+        strategy passed to :func:`trim_overlaps` and :func:`fill_gaps`
+    tiles : int | tuple(int, int), default 10
+        number of tiles along each axis
+    halo : float, optional
+        width of the margin read around each tile. Defaults to 10% of the tile
+        size. The margin grows automatically where the repairs require it.
+    id_column : str, optional
+        column holding a unique feature id. Defaults to the feature id (FID) of
+        files read by pyogrio and is required for GeoParquet.
+
+    Returns
+    -------
+    dict
+        number of violations of each type found before the repair, empty if
+        ``violations`` is None
+    """
+    unknown = set(steps) - {"add_interiors", "trim_overlaps", "fill_gaps"}
+    if unknown:
+        raise ValueError(f"Unknown repair steps: {sorted(unknown)}")
+
+    writer = _Writer()
+    counts = dict.fromkeys(VIOLATION_TYPES, 0) if violations is not None else {}
+    for chunk in _chunks(path, layer, tiles, halo, id_column):
+        if violations is not None:
+            with _stage("detect", chunk.gdf.geometry.values):
+                found = _violations(chunk)
+            for name, n in found["violation"].value_counts().items():
+                counts[name] += n
+            with _stage("write", found.geometry.values):
+                writer.write(found, violations)
+
+        with _stage("repair", chunk.gdf.geometry.values):
+            repaired = _repair(chunk, steps, strategy).loc[chunk.core_ids]
+        repaired = repaired.rename_axis(id_column or "source_fid").reset_index()
+        with _stage("write", repaired.geometry.values):
+            writer.write(repaired, output)
+    return counts
+
+
+def _repair(chunk, steps, strategy):
+    """Apply the repair steps to the features of a chunk.
+
+    Features reaching beyond the window may miss some of the features they
+    intersect, so their repair, and the repair of the features they interact
+    with, may differ from the in-memory repair. The window grows until none of
+    them affects a feature of the tile.
+    """
+    while True:
+        gdf = chunk.gdf.sort_index()
+        # the features within the window intersect no feature outside of it
+        exact = shapely.within(gdf.geometry.values, shapely.box(*chunk.window))
+        for step in steps:
+            context = PlanarContext(gdf)
+            if step == "add_interiors":
+                # containers receive the holes of the features they contain
+                i, j = context.query("contains")
+                exact[i[~exact[j]]] = False
+                gdf = add_interiors(gdf, inplace=True, context=context)
+            elif step == "trim_overlaps":
+                i, j = context.query("intersects")
+                # trimming only removes area, so touching polygons never overlap
+                overlap = (i != j) & ~shapely.touches(
+                    context.geometry[i], context.geometry[j]
+                )
+                exact = _trimmed_exactly(exact, i[overlap], j[overlap])
+                gdf = trim_overlaps(
+                    gdf, strategy=strategy, inplace=True, context=context
+                )
+            else:
+                found = chunk.gaps(gdf.geometry.values)
+                if found is None:  # the window grew, start over
+                    break
+                # the features receiving the gaps are chosen among their neighbors
+                _, neighbors = context.sindex.query(found, predicate="intersects")
+                if not exact[neighbors].all():
+                    chunk.grow()
+                    break
+                # only the gaps touching the features of the tile are filled
+                exact &= shapely.within(context.geometry, shapely.box(*chunk.target))
+                if len(found):
+                    gap_df = geopandas.GeoDataFrame(geometry=found, crs=gdf.crs)
+                    gdf = fill_gaps(
+                        gdf, gap_df, strategy=strategy, inplace=True, context=context
+                    )
+        else:
+            if exact[gdf.index.isin(chunk.core_ids)].all():
+                return gdf
+            chunk.grow()
+
+
+def _trimmed_exactly(exact, left, right):
+    """Find the polygons trimmed as in the whole layer.
+
+    The overlapping pairs are resolved in order and the outcome of a pair depends
+    on the state of both polygons, so a polygon is only trimmed as in the whole
+    layer if both polygons of each of its pairs are by the time it is resolved.
+
+    Parameters
+    ----------
+    exact : np.ndarray
+        boolean mask of the polygons identical to those of the whole layer
+    left, right : np.ndarray
+        positional indices of the overlapping pairs
+
+    Returns
+    -------
+    np.ndarray
+        boolean mask of the polygons identical to those of the whole layer once
+        trimmed
+    """
+    order = np.lexsort((right, left))
+    exact = exact.tolist()
+    for i, j in zip(left[order].tolist(), right[order].tolist(), strict=True):
+        if not (exact[i] and exact[j]):
+            exact[i] = exact[j] = False
+    return np.asarray(exact, dtype=bool)
+
+
+class _Reader:
+    """Bounding box reads from a file-backed layer split into tiles."""
+
+    def __init__(self, path, layer, tiles, halo, id_column):
+        self.path = str(path)
+        self.layer = layer
+        self.id_column = id_column
+        self.parquet = self.path.endswith((".parquet", ".geoparquet"))
+        if self.parquet and id_column is None:
+            raise ValueError("id_column is required to read GeoParquet files.")
+        self.extent = self._extent()
+        self.grid, self.shape = _tile_grid(self.extent, tiles)
+        if halo is None:
+            halo = 0.1 * max(
+                self.grid[0, 2] - self.grid[0, 0], self.grid[0, 3] - self.grid[0, 1]
+            )
+        self.halo = halo
+
+    def _extent(self):
+        if not self.parquet:
+            import pyogrio
+
+            info = pyogrio.read_info(
+                self.path, layer=self.layer, force_total_bounds=True
+            )
+            return np.asarray(info["total_bounds"], dtype=float)
+
+        import pyarrow.parquet as pq
+
+        metadata = json.loads(pq.read_schema(self.path).metadata[b"geo"])
+        column = metadata["primary_column"]
+        bbox = metadata["columns"][column].get("bbox")
+        if bbox is not None:
+            return np.asarray(bbox, dtype=float)
+        # stream the geometry column to compute the extent
+        extent = np.array([np.inf, np.inf, -np.inf, -np.inf])
+        for batch in pq.ParquetFile(self.path).iter_batches(columns=[column]):
+            bounds = shapely.total_bounds(shapely.from_wkb(batch.column(0)))
+            extent = np.r_[
+                np.fmin(extent[:2], bounds[:2]), np.fmax(extent[2:], bounds[2:])
+            ]
+        return extent
+
+    def read(self, window):
+        """Read the features intersecting a window, indexed by their id."""
+        bbox = tuple(float(v) for v in window)
+        if self.parquet:
+            gdf = geopandas.read_parquet(self.path, bbox=bbox)
+        else:
+            import pyogrio
+
+            gdf = pyogrio.read_dataframe(
+                self.path,
+                layer=self.layer,
+                bbox=bbox,
+                fid_as_index=self.id_column is None,
+            )
+        if self.id_column is not None:
+            gdf = gdf.set_index(self.id_column)
+        # bbox filters compare envelopes, keep the features actually intersecting
+        return gdf[shapely.intersects(gdf.geometry.values, shapely.box(*bbox))]
+
+    def tile_of(self, geoms, interior=False):
+        """Find the tile each geometry belongs to.
+
+        Features belong to the tile containing the centre of their bounding box,
+        gaps to the tile containing their interior point.
+        """
+        if interior:
+            points = shapely.get_coordinates(
+                shapely.point_on_surface(shapely.normalize(geoms))
+            )
+        else:
+            bounds = shapely.bounds(geoms).reshape(-1, 4)
+            points = (bounds[:, :2] + bounds[:, 2:]) / 2
+        return _tile_of(points, self.extent, self.shape)
+
+
+class _Chunk:
+    """Features read around one tile of a file-backed layer.
+
+    Attributes
+    ----------
+    gdf : GeoDataFrame
+        features intersecting the window, indexed by their id
+    core_ids : pandas.Index
+        ids of the features belonging to the tile
+    target : np.ndarray
+        bounds of the features belonging to the tile
+    window : np.ndarray
+        bounds of the area read
+    """
+
+    def __init__(self, reader, tile):
+        self.reader = reader
+        self.tile = tile
+        self.read(reader.grid[tile] + np.array([-1, -1, 1, 1]) * reader.halo)
+        core = reader.tile_of(self.gdf.geometry.values) == tile
+        self.core_ids = self.gdf.index[core]
+        if not core.any():
+            return
+        # make sure the neighborhood of every feature of the tile is read
+        self.target = shapely.total_bounds(self.gdf.geometry.values[core])
+        window = np.r_[
+            np.minimum(self.window[:2], self.target[:2] - reader.halo),
+            np.maximum(self.window[2:], self.target[2:] + reader.halo),
+        ]
+        if not np.array_equal(window, self.window):
+            self.read(window)
+
+    def read(self, window):
+        self.window = window
+        with _stage("read"):
+            self.gdf = self.reader.read(window)
+
+    def grow(self):
+        """Read a window twice as far from the features of the tile."""
+        margin = np.r_[
+            self.target[:2] - self.window[:2], self.window[2:] - self.target[2:]
+        ]
+        self.read(self.window + np.array([-1, -1, 1, 1]) * margin)
+
+    def gaps(self, geoms):
+        """Find the gaps touching the features of the tile.
+
+        Returns None and reads a larger window if ``geoms`` (the geometries of
+        the window, possibly modified) are not sufficient to find them.
+        """
+        found, window = _window_gaps(
+            np.asarray(geoms), self.target, self.window, self.reader.extent
+        )
+        if found is None:
+            self.read(window)
+        return found
+
+
+def _chunks(path, layer, tiles, halo, id_column):
+    """Yield the chunk of each tile holding any features."""
+    reader = _Reader(path, layer, tiles, halo, id_column)
+    for tile in range(len(reader.grid)):
+        chunk = _Chunk(reader, tile)
+        if len(chunk.core_ids):
+            yield chunk
+
+
+def _violations(chunk):
+    """Collect the violations of the features of a chunk.
+
+    Pairs are reported once, by the tile of the feature with the smaller id, and
+    gaps by the tile containing their interior point.
+    """
+    found = chunk.gaps(chunk.gdf.geometry.values)
+    while found is None:
+        found = chunk.gaps(chunk.gdf.geometry.values)
+    found = found[chunk.reader.tile_of(found, interior=True) == chunk.tile]
+
+    gdf = chunk.gdf
+    ids = gdf.index.to_numpy()
+    core = gdf.index.isin(chunk.core_ids)
+    geoms = np.asarray(gdf.geometry.values)
+    records = []
+
+    invalid = np.flatnonzero(core & ~shapely.is_valid(geoms))
+    records.append(("invalid", ids[invalid], None, geoms[invalid]))
+
+    context = PlanarContext(gdf)
+    i, j = overlaps(gdf, context=context)
+    mask = core[i] & (ids[i] < ids[j])
+    i, j = i[mask], j[mask]
+    records.append(
+        ("overlap", ids[i], ids[j], shapely.intersection(geoms[i], geoms[j]))
+    )
+
+    i, j = missing_interiors(gdf, context=context)
+    mask = core[i]
+    i, j = i[mask], j[mask]
+    records.append(("missinginterior", ids[i], ids[j], geoms[j]))
+
+    i, j = _non_planar_pairs(context)
+    mask = core[i] & (ids[i] < ids[j])
+    i, j = i[mask], j[mask]
+    records.append(
+        ("nonplanaredge", ids[i], ids[j], shapely.intersection(geoms[i], geoms[j]))
+    )
+
+    records.append(("gap", None, None, found))
+
+    return geopandas.GeoDataFrame(
+        pd.concat(
+            [
+                pd.DataFrame(
+                    {"violation": name, "id_a": a, "id_b": b, "geometry": geometry},
+                    columns=VIOLATION_COLUMNS + ["geometry"],
+                )
+                for name, a, b, geometry in records
+                if len(geometry)
+            ]
+            or [pd.DataFrame(columns=VIOLATION_COLUMNS + ["geometry"])],
+            ignore_index=True,
+        ),
+        geometry="geometry",
+        crs=gdf.crs,
+    )
+
+
+class _Writer:
+    """Append features to files, replacing them on the first write."""
+
+    def __init__(self):
+        self.written = set()
+
+    def write(self, gdf, path):
+        import pyogrio
+
+        if not len(gdf):
+            return
+        # the first chunk may not hold all geometry types of the layer
+        pyogrio.write_dataframe(
+            gdf, path, append=path in self.written, geometry_type="Unknown"
+        )
+        self.written.add(path)
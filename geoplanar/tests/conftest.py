@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Polygon layers shared by the tests."""
+
+import geopandas
+import numpy
+import pytest
+from shapely.affinity import scale
+from shapely.geometry import Polygon, box
+
+
+@pytest.fixture
+def grid():
+    """4x4 grid of unit squares with a gap, an overlap and a missing interior."""
+    cells = [box(i, j, i + 1, j + 1) for i in range(4) for j in range(4)]
+    cells[5] = box(1, 1, 1.9, 1.9)  # gap
+    cells[10] = box(2, 2, 3.2, 3)  # overlap
+    cells.append(box(0.2, 0.2, 0.4, 0.4))  # missing interior
+    return geopandas.GeoDataFrame(geometry=cells, crs=3857)
+
+
+@pytest.fixture
+def jittered_grid():
+    """12x12 grid of unit squares, a fifth of them shrunk to leave gaps."""
+    rng = numpy.random.default_rng(0)
+    cells = [
+        box(j, i, j + rng.uniform(0.8, 1), i + rng.uniform(0.8, 1))
+        if rng.random() < 0.2
+        else box(j, i, j + 1, i + 1)
+        for i in range(12)
+        for j in range(12)
+    ]
+    return geopandas.GeoDataFrame(geometry=cells, crs=3857)
+
+
+def _lattice(n, rng):
+    """Quadrilaterals of an n x n square lattice with jittered inner vertices."""
+    vertices = numpy.stack(
+        numpy.meshgrid(numpy.arange(n + 1.0), numpy.arange(n + 1.0)), -1
+    )
+    vertices[1:-1, 1:-1] += rng.uniform(-0.3, 0.3, (n - 1, n - 1, 2))
+    return [
+        Polygon(
+            [
+                vertices[i, j],
+                vertices[i, j + 1],
+                vertices[i + 1, j + 1],
+                vertices[i + 1, j],
+            ]
+        )
+        for i in range(n)
+        for j in range(n)
+    ]
+
+
+@pytest.fixture
+def sliver_grid():
+    """4x4 jittered grid with an enlarged cell, whose trimmed overlaps leave
+    slivers of less than 1e-15."""
+    cells = _lattice(4, numpy.random.default_rng(5))
+    cells[5] = scale(cells[5], 1.1, 1.1)
+    return geopandas.GeoDataFrame(geometry=cells, crs=3857)
+
+
+@pytest.fixture
+def jittered_lattice():
+    """12x12 jittered grid, a tenth of the cells shrunk and a tenth enlarged."""
+    rng = numpy.random.default_rng(2)
+    cells = _lattice(12, rng)
+    factors = rng.choice([0.9, 1, 1.1], len(cells), p=[0.1, 0.8, 0.1])
+    cells = [scale(cell, f, f) for cell, f in zip(cells, factors, strict=True)]
+    return geopandas.GeoDataFrame(geometry=cells, crs=3857)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import numpy
+import pytest
+from numpy.testing import assert_equal
+
+import geoplanar
+from geoplanar import PlanarContext
+
+
+class TestContext:
+    def test_query_cache(self, grid):
+        context = PlanarContext(grid)
+        pairs = context.query("intersects")
+        assert context.query("intersects") is pairs
+        assert not pairs.flags.writeable
+        assert_equal(pairs, grid.sindex.query(grid.geometry, predicate="intersects"))
+        assert_equal(
+            context.query("overlaps", boundary=True),
+            grid.boundary.sindex.query(grid.boundary, predicate="overlaps"),
+        )
+
+    def test_relate(self, grid):
+        context = PlanarContext(grid)
+        pairs, matrices = context.relate()
+        assert matrices.shape == (pairs.shape[1], 9)
+        assert matrices.dtype == "S1"
+        for predicate in ["overlaps", "contains"]:
+            assert_equal(
+                context.query(predicate),
+                grid.sindex.query(grid.geometry, predicate=predicate),
+            )
+
+    def test_shared_context(self, grid):
+        context = PlanarContext(grid)
+        assert_equal(
+            geoplanar.overlaps(grid, context=context),
+            geoplanar.overlaps(grid),
+        )
+        assert geoplanar.is_overlapping(grid, context=context)
+        assert_equal(
+            geoplanar.missing_interiors(grid, context=context),
+            geoplanar.missing_interiors(grid),
+        )
+        assert_equal(
+            geoplanar.gaps(grid, context=context).area.values,
+            geoplanar.gaps(grid).area.values,
+        )
+        for func in [
+            geoplanar.add_interiors,
+            geoplanar.trim_overlaps,
+            geoplanar.fill_gaps,
+        ]:
+            assert_equal(
+                func(grid, context=context).area.values,
+                func(grid).area.values,
+            )
+        assert_equal(
+            geoplanar.snap(grid, 0.2, context=context).area.values,
+            geoplanar.snap(grid, 0.2).area.values,
+        )
+        assert not geoplanar.is_planar_enforced(grid, context=context)
+
+    def test_mismatch(self, grid):
+        context = PlanarContext(grid.iloc[:-1])
+        with pytest.raises(ValueError, match="context"):
+            geoplanar.overlaps(grid, context=context)
+        gdf = grid.set_index(numpy.arange(len(grid)) + 1)
+        with pytest.raises(ValueError, match="context"):
+            geoplanar.gaps(gdf, context=PlanarContext(grid))
+
+    def test_update(self, jittered_lattice):
+        context = PlanarContext(jittered_lattice)
+        keys = [
+            ("intersects", None, False),
+            ("contains", None, False),
+            ("dwithin", 0.1, False),
+            ("overlaps", None, True),
+        ]
+        for predicate, distance, boundary in keys:
+            context.query(predicate, distance=distance, boundary=boundary)
+
+        gdf = geoplanar.trim_overlaps(jittered_lattice)
+        changed = numpy.flatnonzero(
+            ~gdf.geometry.geom_equals_exact(jittered_lattice.geometry, 0)
+        )
+        assert 0 < len(changed) < len(gdf)
+        context.update(gdf, changed)
+
+        expected = PlanarContext(gdf)
+        assert_equal(context.boundary, expected.boundary)
+        for predicate, distance, boundary in keys:
+            pairs = expected.query(predicate, distance=distance, boundary=boundary)
+            assert_equal(
+                context.query(predicate, distance=distance, boundary=boundary),
+                pairs[:, numpy.lexsort(pairs[::-1])],
+            )
+        with pytest.raises(ValueError, match="context"):
+            context.update(gdf.iloc[:-1], changed)
@@ -4,11 +4,12 @@ import os.path
 import geopandas
 import numpy
 import pytest
-from numpy.testing import assert_equal
+import shapely
+from numpy.testing import assert_allclose, assert_equal
 from packaging.version import Version
 from shapely.geometry import Polygon, box
 
-from geoplanar import fill_gaps, gaps, snap
+from geoplanar import fill_gaps, gaps, snap, trim_overlaps
 
 HERE = os.path.abspath(os.path.dirname(__file__))
 PACKAGE_DIR = os.path.dirname(os.path.dirname(HERE))
@@ -28,6 +29,21 @@ class TestGap:
         assert_equal(h.area.values, numpy.array([4.0, 4.0]))
         assert self.gdf_crs.crs.equals(h.crs)
 
+    def test_gaps_tiled(self, jittered_grid):
+        gdf = jittered_grid
+        expected = sorted(shapely.to_wkb(shapely.normalize(gaps(gdf).values)))
+        for tiles, n_jobs in [(1, 1), (3, 1), ((4, 2), 1), (5, 2)]:
+            h = gaps(gdf, tiles=tiles, n_jobs=n_jobs)
+            assert sorted(shapely.to_wkb(shapely.normalize(h.values))) == expected
+            assert gdf.crs.equals(h.crs)
+
+        h = gaps(self.gdf_crs, tiles=2)
+        assert_equal(h.area.values, numpy.array([4.0, 4.0]))
+
+        h = gaps(self.gdf_crs.iloc[:0], tiles=4)
+        assert len(h) == 0
+        assert self.gdf_crs.crs.equals(h.crs)
+
     def test_fill_gaps(self):
         gdf1 = fill_gaps(self.gdf)
         assert_equal(gdf1.area.values, numpy.array([108.0, 32.0]))
@@ -35,6 +51,13 @@ class TestGap:
         gdf1 = fill_gaps(self.gdf_str)
         assert_equal(gdf1.area.values, numpy.array([108.0, 32.0]))
 
+    def test_fill_gaps_duplicated_index(self):
+        gdf = self.gdf_crs.set_index(numpy.array(["foo", "foo"]))
+        gdf1 = fill_gaps(gdf)
+        assert_equal(gdf1.area.values, numpy.array([108.0, 32.0]))
+        gdf1 = fill_gaps(gdf, gaps(gdf))
+        assert_equal(gdf1.area.values, numpy.array([108.0, 32.0]))
+
     def test_fill_gaps_smallest(self):
         gdf1 = fill_gaps(self.gdf, strategy='smallest')
         assert_equal(gdf1.area.values, numpy.array([100.0, 40.0]))
@@ -43,6 +66,17 @@ class TestGap:
         gdf1 = fill_gaps(self.gdf, strategy=None)
         assert_equal(gdf1.area.values, numpy.array([108.0, 32.0]))
 
+    def test_fill_gaps_ties(self):
+        ring = [box(0, 0, 3, 1), box(0, 2, 3, 3), box(0, 1, 1, 2), box(2, 1, 3, 2)]
+        gdf = geopandas.GeoDataFrame(geometry=ring)
+        filled = fill_gaps(gdf, strategy="largest")
+        assert_equal(filled.area.values, numpy.array([4.0, 3.0, 1.0, 1.0]))
+        filled = fill_gaps(gdf, strategy="smallest")
+        assert_equal(filled.area.values, numpy.array([3.0, 3.0, 2.0, 1.0]))
+
+        filled = fill_gaps(gdf.iloc[::-1], strategy="largest")
+        assert_equal(filled.area.values, numpy.array([1.0, 1.0, 4.0, 3.0]))
+
     def test_fill_gaps_gaps_df(self):
         gaps_df = gaps(self.gdf).loc[[0]]
         filled = fill_gaps(self.gdf, gaps_df)
@@ -51,6 +85,29 @@ class TestGap:
         filled = fill_gaps(self.gdf_str, gaps_df)
         assert_equal(filled.area, numpy.array([104, 32]))
 
+    def test_fill_gaps_slivers(self, sliver_grid):
+        trimmed = trim_overlaps(sliver_grid)
+        gaps_df = gaps(trimmed)
+        assert (gaps_df.area < 1e-15).any()
+        filled = fill_gaps(trimmed)
+        assert filled.union_all().covers(gaps_df.union_all())
+        assert (filled.area >= trimmed.area).all()
+        assert_allclose(filled.area.sum(), trimmed.area.sum() + gaps_df.area.sum())
+
+    def test_fill_gaps_bbox(self, jittered_grid):
+        gdf = jittered_grid
+        bbox = (2.5, 3.5, 6.5, 5.5)
+        gaps_df = gaps(gdf)
+        expected = fill_gaps(gdf, gaps_df[gaps_df.intersects(box(*bbox))])
+        for gap_df in [None, gaps_df]:
+            filled = fill_gaps(gdf, gap_df, bbox=bbox)
+            changed = ~filled.geom_equals_exact(gdf, 0)
+            assert changed.any() and not changed.all()
+            assert filled.geom_equals(expected).all()
+
+        filled = fill_gaps(gdf.iloc[:0], bbox=bbox)
+        assert len(filled) == 0
+
 
 @pytest.mark.skipif(
     Version(geopandas.__version__) < Version("1.0.0dev"),
@@ -97,8 +154,32 @@ class TestSnap:
         gdf = geopandas.GeoDataFrame(geometry=[self.p3, self.p4, self.p5])
         gdf1 = snap(gdf, 1)
         assert_equal(
-            numpy.round(gdf1.area.values, decimals=1), numpy.array([114.1, 102.3, 7.7])
+            numpy.round(gdf1.area.values, decimals=1), numpy.array([114.4, 102.3, 7.7])
+        )
+
+    def test_snap_multiple_targets(self):
+        gdf = geopandas.GeoDataFrame(
+            geometry=[
+                box(0, 0, 10, 10),
+                box(10.5, -5, 20, 5),
+                box(-5, 10.5, 5, 20),
+                box(-6, -5, -0.5, 5),
+            ]
         )
+        gdf1 = snap(gdf, 1)
+        assert_equal(
+            numpy.round(gdf1.area.values, decimals=2),
+            numpy.array([108.42, 95.0, 95.0, 55.0]),
+        )
+
+    def test_snap_holes(self):
+        p = Polygon(box(0, 0, 10, 10).exterior.coords, holes=[[(2, 2), (4, 2), (4, 4)]])
+        gdf = geopandas.GeoDataFrame(
+            geometry=[p, box(10.5, 0, 20, 10), box(-5, -5, 0.5, 2)]
+        )
+        gdf1 = snap(gdf, 1)
+        assert_equal(gdf1.area.values, numpy.array([103.0, 95.0, 38.5]))
+        assert gdf1.geometry.iloc[0].interiors[0].equals(p.interiors[0])
 
     def test_validity(self):
         df = geopandas.read_file(
@@ -2,6 +2,7 @@
 
 import geopandas
 import numpy
+from numpy.testing import assert_allclose, assert_equal
 from shapely.geometry import box
 
 from geoplanar.hole import add_interiors, missing_interiors
@@ -18,13 +19,30 @@ class TestHole:
 
     def test_missing_interiors(self):
         mi = missing_interiors(self.gdf)
-        assert mi == [(0, 1), (0, 2)]
+        assert_equal(mi, [[0, 0], [1, 2]])
 
     def test_add_interiors(self):
         gdf1 = add_interiors(self.gdf, inplace=True)
         mi = missing_interiors(gdf1)
-        assert mi == []
+        assert mi.shape == (2, 0)
 
         gdf1 = add_interiors(self.gdf_str, inplace=True)
         mi = missing_interiors(gdf1)
-        assert mi == []
+        assert mi.shape == (2, 0)
+
+    def test_add_interiors_nested(self):
+        # an island in a lake in a county, next to a second lake
+        gdf = geopandas.GeoDataFrame(
+            geometry=[
+                box(2, 2, 4, 4),
+                box(0, 0, 10, 10),
+                box(1, 1, 5, 5),
+                box(6, 6, 8, 8),
+            ]
+        )
+        mi = missing_interiors(gdf)
+        assert_equal(mi, [[1, 1, 1, 2], [0, 2, 3, 0]])
+
+        gdf1 = add_interiors(gdf)
+        assert_allclose(gdf1.area.values, [4, 80, 12, 4])
+        assert missing_interiors(gdf1).shape == (2, 0)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import importlib
+import subprocess
+import sys
+
+import geoplanar
+
+
+class TestImport:
+    def test_exports(self):
+        for module in set(geoplanar._EXPORTS.values()):
+            exported = {n for n, m in geoplanar._EXPORTS.items() if m == module}
+            names = importlib.import_module(f"geoplanar.{module}").__all__
+            assert exported == set(names)
+        for name in geoplanar.__all__:
+            assert name in dir(geoplanar)
+            assert getattr(geoplanar, name).__module__.startswith("geoplanar.")
+
+    def test_lazy(self):
+        code = (
+            "import sys, geoplanar; "
+            "assert 'geopandas' not in sys.modules; "
+            "geoplanar.is_overlapping; "
+            "assert 'libpysal' not in sys.modules"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import json
+
+import geoplanar
+from geoplanar import instrument
+from geoplanar.instrumentation import _stage
+
+
+class TestInstrument:
+    def test_stages(self, grid):
+        with instrument() as stats:
+            geoplanar.fill_gaps(grid)
+        summary = stats.to_dict()
+        assert set(summary) == {"fill_gaps", "gaps"}
+        assert summary["fill_gaps"]["total"]["calls"] == 1
+        assert summary["fill_gaps"]["total"]["geometries"] == len(grid)
+        assert summary["fill_gaps"]["total"]["vertices"] == 5 * len(grid)
+        assert {"query", "select", "union", "write"} <= set(summary["fill_gaps"])
+        # the shared spatial index is built by the first function using it
+        assert {"boundary", "polygonize", "sindex", "within"} <= set(summary["gaps"])
+        for stages in summary.values():
+            for stage in stages.values():
+                assert stage["seconds"] >= 0
+
+    def test_nested(self, grid):
+        with instrument() as stats:
+            geoplanar.check_validity(grid)
+        summary = stats.to_dict()
+        assert {
+            "check_validity",
+            "gaps",
+            "overlaps",
+            "non_planar_edges",
+            "missing_interiors",
+        } <= set(summary)
+        assert summary["check_validity"]["relate"]["calls"] == 1
+        assert summary["missing_interiors"]["total"]["calls"] == 1
+
+    def test_export(self, grid, tmp_path):
+        received = []
+        with instrument(callback=received.append) as stats:
+            geoplanar.trim_overlaps(grid)
+            with instrument() as inner:
+                geoplanar.add_interiors(grid)
+        assert received == stats.records
+        assert {r["function"] for r in stats.records} == {"trim_overlaps"}
+        assert {r["function"] for r in inner.records} == {
+            "add_interiors",
+            "missing_interiors",
+        }
+
+        lines = stats.to_jsonl().splitlines()
+        assert [json.loads(line) for line in lines] == stats.records
+        stats.to_jsonl(tmp_path / "stats.jsonl")
+        assert (tmp_path / "stats.jsonl").read_text().splitlines() == lines
+
+    def test_inactive(self, grid):
+        geoplanar.fill_gaps(grid)
+        with instrument() as stats:
+            pass
+        assert stats.records == []
+        assert stats.to_dict() == {}
+
+    def test_selection(self, grid):
+        def fail():
+            raise AssertionError("selected without a recorder")
+
+        with _stage("inactive", fail):
+            pass
+        with instrument() as stats:
+            geoplanar.add_interiors(grid)
+        difference = stats.to_dict()["add_interiors"]["difference"]
+        assert difference["geometries"] == 1
+        assert difference["vertices"] == 5
@@ -43,6 +43,10 @@ class TestOverlap:
         gdf1 = trim_overlaps(self.gdf, strategy=None)
         assert_equal(gdf1.area.values, numpy.array([100.0, 4.0]))
 
+    def test_trim_overlaps_unknown_strategy(self):
+        with pytest.raises(ValueError, match="strategy"):
+            trim_overlaps(self.gdf, strategy="first")
+
     @pytest.mark.skipif(Version(geopandas.__version__) == Version("0.10.2"), reason="Missing pygeos")    
     def test_trim_overlaps_multiple(self):
         gdf1 = trim_overlaps(self.gdf2, strategy='largest')
@@ -60,6 +64,70 @@ class TestOverlap:
         gdf = trim_overlaps(self.gdf2, strategy='compact')
         assert_equal(gdf1.area.values, numpy.array([100.0, 100.0, 0.0]))
 
+    def test_trim_overlaps_sequential_equivalence(self):
+        rng = numpy.random.default_rng(0)
+        xy = rng.uniform(0, 20, (60, 2))
+        size = rng.uniform(1, 4, (60, 2))
+        gdf = geopandas.GeoDataFrame(
+            geometry=[
+                box(x, y, x + w, y + h)
+                for (x, y), (w, h) in zip(xy, size, strict=True)
+            ]
+        )
+        # pairs are resolved in order of position, skipping those that only touch
+        pairs = gdf.sindex.query(gdf.geometry, predicate="intersects")
+        pairs = pairs[:, numpy.lexsort(pairs[::-1])].T
+
+        def iq(geom):
+            if not geom.length:
+                return numpy.nan
+            return 4 * numpy.pi * geom.area / geom.length**2
+
+        for strategy in ["largest", "smallest", "compact", None]:
+            expected = list(gdf.geometry)
+            for i, j in pairs:
+                if i == j or gdf.geometry[i].touches(gdf.geometry[j]):
+                    continue
+                if strategy == "compact":
+                    left_c = expected[i].difference(expected[j])
+                    right_c = expected[j].difference(expected[i])
+                    trim_left = iq(left_c) > iq(right_c)
+                elif strategy is None:
+                    trim_left = False
+                elif strategy == "largest":
+                    trim_left = expected[i].area > expected[j].area
+                else:
+                    trim_left = expected[i].area < expected[j].area
+                if trim_left:
+                    expected[i] = expected[i].difference(expected[j])
+                else:
+                    expected[j] = expected[j].difference(expected[i])
+            for n_jobs in [1, 2]:
+                trimmed = trim_overlaps(gdf, strategy=strategy, n_jobs=n_jobs)
+                assert all(
+                    a.equals_exact(b, 0)
+                    for a, b in zip(trimmed.geometry, expected, strict=True)
+                )
+
+    def test_trim_overlaps_bbox(self):
+        rng = numpy.random.default_rng(1)
+        xy = rng.uniform(0, 40, (200, 2))
+        size = rng.uniform(1, 4, (200, 2))
+        gdf = geopandas.GeoDataFrame(
+            geometry=[
+                box(x, y, x + w, y + h)
+                for (x, y), (w, h) in zip(xy, size, strict=True)
+            ]
+        )
+        bbox = (10, 10, 20, 20)
+        for strategy in ["largest", "smallest", "compact", None]:
+            full = trim_overlaps(gdf, strategy=strategy)
+            local = trim_overlaps(gdf, strategy=strategy, bbox=bbox)
+            changed = ~local.geom_equals_exact(gdf, 0)
+            region = gdf.intersects(box(*bbox))
+            assert changed.any() and not changed.all()
+            assert local[changed | region].geom_equals(full[changed | region]).all()
+
     def test_merge_overlaps(self):
         gdf1 = merge_overlaps(self.gdf, 10, 0)
         assert_equal(gdf1.area.values, numpy.array([104]))
@@ -81,6 +149,19 @@ class TestOverlap:
         gdf1 = merge_overlaps(self.gdf2, 10, 0)
         assert_equal(gdf1.area.values, numpy.array([200]))
 
+    def test_merge_overlaps_singletons(self):
+        gdf = geopandas.GeoDataFrame(
+            {"name": ["a", "b", "c", "d"]},
+            geometry=[self.p1, box(30, 0, 40, 10), self.p2, box(50, 0, 60, 10)],
+            crs=3857,
+        )
+        gdf1 = merge_overlaps(gdf, 10, 0)
+        assert_equal(gdf1.index.to_list(), [0, 1, 3])
+        assert_equal(gdf1.area.values, numpy.array([104, 100, 100]))
+        assert_equal(gdf1["name"].to_list(), ["a", "b", "d"])
+        assert gdf1.geometry.iloc[2].equals_exact(gdf.geometry.iloc[3], 0)
+        assert gdf1.crs == gdf.crs
+
 
 class TestTouching:
     def setup_method(self):
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import pytest
+import shapely
+
+import geoplanar
+
+
+class TestRepair:
+    def test_repair(self, grid):
+        repaired, summary = geoplanar.repair(grid)
+        expected = geoplanar.add_interiors(grid)
+        expected = geoplanar.trim_overlaps(expected)
+        expected = geoplanar.fill_gaps(expected)
+        expected = geoplanar.fix_npe_edges(expected)
+        assert shapely.equals_identical(
+            repaired.geometry.values, expected.geometry.values
+        ).all()
+        assert list(summary) == [
+            "add_interiors",
+            "trim_overlaps",
+            "fill_gaps",
+            "fix_npe_edges",
+            "is_planar_enforced",
+        ]
+        assert summary["add_interiors"] == 1
+        assert summary["is_planar_enforced"]
+        assert not geoplanar.is_planar_enforced(grid)
+
+    def test_repair_steps(self, grid):
+        repaired, summary = geoplanar.repair(grid, steps=["add_interiors"])
+        assert summary == {"add_interiors": 1}
+        assert repaired.geometry[0].area == pytest.approx(0.96)
+        assert grid.geometry[0].area == 1
+
+        gdf = grid.copy()
+        repaired, _ = geoplanar.repair(gdf, steps=["add_interiors"], inplace=True)
+        assert repaired is gdf
+        assert gdf.geometry[0].area == pytest.approx(0.96)
+
+        _, summary = geoplanar.repair(
+            grid, steps=["snap", "is_planar_enforced"], threshold=0.2
+        )
+        assert list(summary) == ["snap", "is_planar_enforced"]
+
+    def test_repair_changed(self, grid, jittered_lattice):
+        trimmed = geoplanar.trim_overlaps(jittered_lattice)
+        for gdf, steps in [
+            (grid, ["snap"]),
+            (trimmed, ["trim_overlaps", "fill_gaps", "fix_npe_edges"]),
+        ]:
+            for step in steps:
+                repaired, summary = geoplanar.repair(gdf, steps=[step], threshold=0.2)
+                changed = ~shapely.equals_exact(
+                    repaired.geometry.values, gdf.geometry.values, tolerance=0
+                )
+                assert summary[step] == changed.sum() > 0
+                # snap rewrites most of the grid without modifying it
+                assert all(
+                    a is b
+                    for a, b, c in zip(
+                        repaired.geometry.values, gdf.geometry.values, changed
+                    )
+                    if not c
+                )
+                gdf = repaired
+
+    def test_repair_invalid_steps(self, grid):
+        with pytest.raises(ValueError, match="Unknown"):
+            geoplanar.repair(grid, steps=["trim"])
+        with pytest.raises(ValueError, match="threshold"):
+            geoplanar.repair(grid, steps=["snap"])
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 import geopandas
 import numpy
+import pytest
+import shapely
 from libpysal.graph import Graph
-from numpy.testing import assert_equal
-from shapely.geometry import MultiPolygon, Polygon
+from numpy.testing import assert_allclose, assert_equal
+from shapely.geometry import MultiPolygon, Polygon, box
 
 import geoplanar
+from geoplanar.planar import fix_self_intersecting_ring
 
 
 class TestPlanar:
@@ -34,3 +37,160 @@ class TestPlanar:
         assert_equal(
             gdf1.geometry.iloc[0].wkt, "POLYGON ((0 0, 0 10, 10 10, 10 2, 10 0, 0 0))"
         )
+
+    def test_non_planar_edges_contiguity(self):
+        # rows of cells shifted against each other touch without shared vertices
+        rng = numpy.random.default_rng(0)
+        cells = [
+            box(j + shift, i, j + shift + 1, i + 1)
+            for i, shift in enumerate(rng.choice([0, 0.5], 8))
+            for j in range(8)
+        ]
+        cells.append(box(0.2, 0.2, 0.4, 0.4))
+        gdf = geopandas.GeoDataFrame(geometry=cells)
+        expected = Graph.build_fuzzy_contiguity(gdf).difference(
+            Graph.build_contiguity(gdf, rook=False, strict=False)
+        )
+        assert geoplanar.non_planar_edges(gdf).equals(expected)
+
+    def test_fix_npe_edges_global(self):
+        gdf1 = geoplanar.fix_npe_edges(self.gdf_str, method="global")
+        assert_equal(
+            gdf1.geometry.iloc[0].wkt, "POLYGON ((0 0, 0 10, 10 10, 10 2, 10 0, 0 0))"
+        )
+        assert gdf1.geometry.iloc[1].equals(self.gdf.geometry.iloc[1])
+
+        # shifted rows of cells, an enclave and an isolated cell
+        rng = numpy.random.default_rng(0)
+        cells = [
+            box(j + shift, i, j + shift + 1, i + 1)
+            for i, shift in enumerate(rng.choice([0, 0.25, 0.5], 8))
+            for j in range(8)
+        ]
+        x = cells[5].bounds[0]
+        hole = box(x + 0.2, 0.2, x + 0.5, 0.4).exterior
+        cells[5] = Polygon(cells[5].exterior, [hole])
+        cells.append(box(x + 0.2, 0.25, x + 0.5, 0.4))
+        cells.append(box(20, 20, 21, 21))
+        gdf = geopandas.GeoDataFrame(geometry=cells)
+
+        pairwise = geoplanar.fix_npe_edges(gdf)
+        fixed = geoplanar.fix_npe_edges(gdf, method="global")
+        assert not geoplanar.non_planar_edges(fixed).n_edges
+        assert shapely.equals(fixed.geometry.values, pairwise.geometry.values).all()
+        assert_equal(
+            shapely.get_num_coordinates(fixed.geometry.values),
+            shapely.get_num_coordinates(pairwise.geometry.values),
+        )
+
+        with pytest.raises(ValueError, match="method"):
+            geoplanar.fix_npe_edges(gdf, method="foo")
+
+    def test_insert_intersections_multiple_points(self):
+        poly_a = box(0, 0, 10, 10)
+        poly_b = Polygon([(10, 2), (12, 5), (10, 8), (14, 5)])
+        new_a, new_b = geoplanar.insert_intersections(poly_a, poly_b)
+        assert_equal(
+            new_a.wkt, "POLYGON ((10 0, 10 2, 10 8, 10 10, 0 10, 0 0, 10 0))"
+        )
+        assert new_b.equals(poly_b)
+
+    def test_planar_enforce(self):
+        gdf = geopandas.GeoDataFrame(
+            {"name": list("abcde")},
+            geometry=[
+                box(0, 0, 4, 10),
+                box(5, 0, 11, 10),
+                box(4, 0, 5, 4),
+                box(4, 6, 5, 10),
+                box(3, 6, 4.5, 7),  # overlaps a and d
+            ],
+            crs=3857,
+        )
+        expected = {
+            "largest": ([39, 60, 4, 3.5, 1.5], [39, 62, 4, 3.5, 1.5]),
+            "smallest": ([40, 60, 4, 4, 0], [40, 60, 4, 4, 2]),
+            "first": ([40, 60, 4, 4, 0], [42, 60, 4, 4, 0]),
+            "compact": ([40, 60, 4, 4, 0], [40, 62, 4, 4, 0]),
+        }
+        for strategy, (areas, filled_areas) in expected.items():
+            enforced = geoplanar.planar_enforce(gdf, strategy)
+            assert_equal(enforced.area.values, areas)
+            assert not geoplanar.is_overlapping(enforced)
+            assert enforced["name"].tolist() == gdf["name"].tolist()
+            assert enforced.crs.equals(gdf.crs)
+
+            filled = geoplanar.planar_enforce(gdf, strategy, fill_gaps=True)
+            assert_equal(filled.area.values, filled_areas)
+
+        with pytest.raises(ValueError, match="strategy"):
+            geoplanar.planar_enforce(gdf, None)
+
+    def test_planar_enforce_slivers(self, sliver_grid):
+        sliver = Polygon([(0.1, 0.3), (0.7, 2.1), (0.4, 1.2000000000000002)])
+        gdf = geopandas.GeoDataFrame(geometry=[box(1, 0, 2, 3), sliver])
+        assert 0 < sliver.area < 1e-15
+        for fill_gaps in [False, True]:
+            enforced = geoplanar.planar_enforce(gdf, fill_gaps=fill_gaps)
+            assert_allclose(enforced.area.values, [3, 0], atol=1e-15)
+
+        trimmed = geoplanar.trim_overlaps(sliver_grid)
+        enforced = geoplanar.planar_enforce(trimmed, fill_gaps=True)
+        assert not geoplanar.is_overlapping(enforced)
+        assert_allclose(enforced.area.sum(), 16)
+
+    def test_check_validity_invalid(self):
+        hole = [(0.5, 1.8), (0.9, 2.2), (0.9, 1.8)]
+        bowtie = Polygon([(0, 0), (4, 4), (4, 0), (0, 4)], [hole])
+        gdf = geopandas.GeoDataFrame(geometry=[box(4, 0, 5, 4), bowtie])
+        assert geoplanar.self_intersecting_rings(gdf) == [1]
+        for n_jobs in [1, 2]:
+            violations = geoplanar.check_validity(gdf, n_jobs=n_jobs)
+            assert violations["selfintersectingrings"] == [1]
+            assert violations["invalidreasons"] == ["Self-intersection[2 2]"]
+            assert violations["overlaps"].shape == (2, 0)
+
+        # the repair keeps the holes
+        fixed = fix_self_intersecting_ring(bowtie)
+        assert fixed.is_valid
+        assert_allclose(fixed.area, 7.92)
+        assert sum(len(part.interiors) for part in fixed.geoms) == 1
+
+    def test_update_validity(self):
+        cells = [box(x, y, x + 1, y + 1) for y in range(6) for x in range(6)]
+        cells[7] = shapely.affinity.scale(cells[7], 0.8, 0.8)
+        cells[14] = shapely.affinity.scale(cells[14], 1.2, 1.2)
+        cells.append(box(3.2, 3.2, 3.4, 3.4))
+        gdf = geopandas.GeoDataFrame(geometry=cells)
+        # move a cell, remove another, add an invalid one and an enclave
+        edited = gdf.drop(index=7)
+        edited.loc[12, "geometry"] = shapely.affinity.translate(
+            edited.geometry[12], 0.3, 0.2
+        )
+        bowtie = Polygon([(8, 0), (10, 2), (10, 0), (8, 2)])
+        edited.loc[100] = [bowtie]
+        edited.loc[101] = [box(4.6, 4.6, 4.8, 4.8)]
+        edited = edited.sort_index()
+        # then move another cell, keeping the invalid one
+        moved = edited.copy()
+        moved.loc[5, "geometry"] = shapely.affinity.translate(moved.geometry[5], 0.3, 0)
+
+        previous, report = gdf, geoplanar.check_validity(gdf)
+        for layer, changed in [(edited, [12]), (moved, [5])]:
+            report = geoplanar.update_validity(layer, previous, report, changed)
+            previous = layer
+            expected = geoplanar.check_validity(layer)
+            assert report.keys() == expected.keys()
+            assert report["selfintersectingrings"] == expected["selfintersectingrings"]
+            assert report["invalidreasons"] == expected["invalidreasons"]
+            # pairs are sorted by position, not in the order of the spatial index
+            for key in ["overlaps", "missinginteriors"]:
+                pairs = expected[key]
+                assert_equal(report[key], pairs[:, numpy.lexsort(pairs[::-1])])
+            assert report["nonplanaredges"].adjacency.equals(
+                expected["nonplanaredges"].adjacency
+            )
+            assert_equal(
+                sorted(shapely.to_wkb(shapely.normalize(report["gaps"].values))),
+                sorted(shapely.to_wkb(shapely.normalize(expected["gaps"].values))),
+            )
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import geopandas
+import numpy
+import pytest
+from numpy.testing import assert_allclose
+from shapely.geometry import box
+
+import geoplanar
+from geoplanar import check_file, repair_file
+
+pytest.importorskip("pyogrio")
+
+
+class TestStreaming:
+    def setup_method(self):
+        rng = numpy.random.default_rng(0)
+        xs = numpy.r_[0, numpy.cumsum(rng.uniform(0.8, 1.2, 12))]
+        ys = numpy.r_[0, numpy.cumsum(rng.uniform(0.8, 1.2, 12))]
+        cells = []
+        for i in range(12):
+            for j in range(12):
+                kind = rng.random()
+                w = xs[j + 1] - xs[j]
+                if kind < 0.1:  # gap
+                    w *= 0.9
+                elif kind < 0.2:  # overlap
+                    w *= 1.1
+                cells.append(box(xs[j], ys[i], xs[j] + w, ys[i + 1]))
+        cells.append(box(3.2, 3.2, 3.4, 3.4))  # missing interior
+        self.gdf = geopandas.GeoDataFrame(
+            {"name": numpy.arange(len(cells))}, geometry=cells, crs=3857
+        )
+
+    def test_check_file(self, tmp_path):
+        src = tmp_path / "src.gpkg"
+        self.gdf.to_file(src)
+        counts = check_file(src, tmp_path / "violations.gpkg", tiles=4)
+
+        expected = geoplanar.check_validity(self.gdf)
+        assert counts["invalid"] == len(expected["selfintersectingrings"])
+        assert counts["gap"] == len(expected["gaps"])
+        assert counts["overlap"] == expected["overlaps"].shape[1] // 2
+        assert counts["missinginterior"] == expected["missinginteriors"].shape[1]
+        assert counts["nonplanaredge"] == expected["nonplanaredges"].n_edges // 2
+
+        violations = geopandas.read_file(tmp_path / "violations.gpkg")
+        assert len(violations) == sum(counts.values())
+        assert violations.crs.equals(self.gdf.crs)
+
+    def test_repair_file(self, tmp_path):
+        src = tmp_path / "src.gpkg"
+        self.gdf.to_file(src)
+        repair_file(src, tmp_path / "repaired.gpkg", tiles=(3, 4))
+
+        repaired = geopandas.read_file(tmp_path / "repaired.gpkg")
+        repaired = repaired.set_index("name").sort_index()
+        expected = geoplanar.fill_gaps(
+            geoplanar.trim_overlaps(geoplanar.add_interiors(self.gdf))
+        )
+        assert_allclose(repaired.area.values, expected.area.values)
+        assert not geoplanar.is_overlapping(repaired)
+
+    def test_repair_file_tiles(self, tmp_path, jittered_lattice):
+        gdf = jittered_lattice.assign(name=numpy.arange(len(jittered_lattice)))
+        src = tmp_path / "src.gpkg"
+        gdf.to_file(src)
+        for steps in [
+            ("trim_overlaps",),
+            ("add_interiors", "trim_overlaps", "fill_gaps"),
+        ]:
+            expected, _ = geoplanar.repair(gdf, steps=steps)
+            for tiles in [2, 3, (3, 4), 4]:
+                out = tmp_path / f"repaired_{len(steps)}_{tiles}.gpkg"
+                repair_file(src, out, steps=steps, tiles=tiles)
+                repaired = geopandas.read_file(out).set_index("name").sort_index()
+                # the geometries of each feature are identical up to rounding
+                difference = repaired.symmetric_difference(expected, align=False)
+                assert (difference.area < 1e-9).all()
+
+    def test_parquet(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        src = tmp_path / "src.parquet"
+        self.gdf.to_parquet(src, write_covering_bbox=True)
+        counts = check_file(
+            src, tmp_path / "violations.gpkg", tiles=3, id_column="name"
+        )
+        assert counts["gap"] == len(geoplanar.gaps(self.gdf))
+
+        with pytest.raises(ValueError, match="id_column"):
+            check_file(src, tmp_path / "violations.gpkg")
@@ -1,9 +1,21 @@
 #!/usr/bin/env python3
 
-from shapely import validation
+import shapely
 
 __all__ = ["isvalid"]
 
 
 def isvalid(obj):
-    return validation.explain_validity(obj)
+    """Explain why geometries are invalid
+
+    Parameters
+    ----------
+    obj : shapely.Geometry | array-like
+        geometry or array of geometries
+
+    Returns
+    -------
+    str | numpy.ndarray
+        "Valid Geometry" or the reason each geometry is invalid
+    """
+    return shapely.is_valid_reason(obj)